@@ -7,6 +7,7 @@ the "Named Pipes Provider: Could not open a connection" error.
 """
 
 import json
+import functools
 import socket
 import pyodbc
 import subprocess
@@ -14,6 +15,11 @@ import sys
 import os
 from datetime import datetime
 
+@functools.lru_cache(maxsize=1)
+def _list_drivers():
+    """Return the installed ODBC drivers, enumerating them only once per run"""
+    return tuple(pyodbc.drivers())
+
 class SQLConnectivityDiagnostic:
     def __init__(self, config_file='replication_config_enhanced.json'):
         self.config_file = config_file
@@ -188,7 +194,7 @@ class SQLConnectivityDiagnostic:
     def check_odbc_driver(self):
         """Check if ODBC Driver 17 for SQL Server is available"""
         try:
-            drivers = pyodbc.drivers()
+            drivers = _list_drivers()
             sql_drivers = [d for d in drivers if 'SQL Server' in d]
             
             if any('17' in d for d in sql_drivers):
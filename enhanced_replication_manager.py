@@ -414,6 +414,8 @@ class EnhancedSQLServerReplicationManager:
         try:
             with self._get_connection(db_config) as conn:
                 cursor = conn.cursor()
+                # Send each executemany batch as a single parameter-array RPC instead of row by row
+                cursor.fast_executemany = True
                 
                 # Check if table has identity column
                 has_identity = False
@@ -441,8 +443,8 @@ class EnhancedSQLServerReplicationManager:
                 placeholders = ', '.join(['?' for _ in data.columns])
                 insert_temp_query = f"INSERT INTO {temp_table} ({columns}) VALUES ({placeholders})"
                 
-                # Convert DataFrame to list of tuples
-                data_tuples = [tuple(None if pd.isna(val) else val for val in row) for _, row in data.iterrows()]
+                # Convert DataFrame to list of tuples (NaN/NaT -> None) without per-row Series objects
+                data_tuples = list(data.astype(object).where(data.notna(), None).itertuples(index=False, name=None))
                 
                 # Insert in batches
                 batch_size = self.config.get('replication', {}).get('batch_size', 1000)
@@ -485,6 +487,7 @@ class EnhancedSQLServerReplicationManager:
         try:
             with self._get_connection(db_config) as conn:
                 cursor = conn.cursor()
+                cursor.fast_executemany = True
                 
                 # Create temporary table for master primary keys
                 temp_pk_table = f"#{table}_master_pks"
@@ -0,0 +1,37 @@
+"""
+Pytest configuration for the replication test scripts
+
+The test_* functions are plain scripts that print progress and return True/False.
+This lets pytest (and pytest-xdist: pytest -n auto) collect them as well:
+- a session-scoped `manager` fixture shares one replication manager per worker
+- a False return value is reported as a test failure
+"""
+
+import functools
+
+import pytest
+
+from test_raw_replication import get_shared_manager
+
+# Deletes rows on the master; only run it deliberately as a script
+collect_ignore = ["test_delete_replication.py"]
+
+@pytest.fixture(scope="session")
+def manager():
+    """One replication manager per test session (per worker under pytest -n)"""
+    return get_shared_manager()
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Let pytest call the test as usual, failing it if the script returns False"""
+    test_func = pyfuncitem.obj
+    
+    @functools.wraps(test_func)
+    def checked(*args, **kwargs):
+        assert test_func(*args, **kwargs) is not False, f"{pyfuncitem.name} reported failure"
+        
+    pyfuncitem.obj = checked
+    try:
+        yield
+    finally:
+        pyfuncitem.obj = test_func
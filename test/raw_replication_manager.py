@@ -11,26 +11,55 @@ Core features:
 
 import pyodbc
 import json
+import hashlib
 import time
 import logging
 import os
+import threading
 from typing import List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 class ReplicationManager:
     """Simplified replication manager for SQL Server transactional replication"""
     
     def __init__(self, config_path: str = 'replication_config_enhanced.json'):
         self.config_path = config_path
+        self._config_stat_cache = None
+        self._config_hash_cache = None
+        self._hash_lock = threading.Lock()
+        self._hash_inflight = None
+        self._reload_inflight = None
+        self._loaded_config_stamp = None
+        self._loaded_config_hash = None
         self.config = self.load_config()
         self.connection_pool = {}
+        self._existing_tables_cache = {}
+        self._existing_tables_lock = threading.Lock()
+        self._schema_cache = {}
+        self._pending_constraints = {}
+        self._pending_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._thread_conns = []
+        self._thread_conns_lock = threading.Lock()
         self.setup_logging()
         
     def load_config(self) -> dict:
         """Load configuration file"""
         try:
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
+            with open(self.config_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                data = f.read()
+            config = orjson.loads(data) if orjson else json.loads(data)
             
             # Set defaults
             rep_config = config.setdefault('replication', {})
@@ -39,13 +68,95 @@ class ReplicationManager:
             rep_config.setdefault('retry_attempts', 3)
             rep_config.setdefault('connection_timeout', 30)
             
+            # Change detection compares against exactly these bytes, not a later re-read
+            stamp = (st.st_mtime_ns, st.st_size)
+            digest = self._digest(data, config)
+            self._loaded_config_stamp = stamp
+            self._loaded_config_hash = digest
+            self._config_stat_cache = stamp
+            self._config_hash_cache = digest
             return config
             
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logging.error(f"Configuration error: {e}")
             raise
             
-
+    def _single_flight(self, slot: str, compute):
+        """Run compute() once and share its result with callers arriving while it is in flight"""
+        with self._hash_lock:
+            inflight = getattr(self, slot)
+            owner = inflight is None
+            if owner:
+                inflight = Future()
+                setattr(self, slot, inflight)
+                
+        if not owner:
+            return inflight.result()
+            
+        try:
+            result = compute()
+            inflight.set_result(result)
+            return result
+        except Exception as e:
+            inflight.set_exception(e)
+            raise
+        finally:
+            with self._hash_lock:
+                setattr(self, slot, None)
+                
+    def _get_config_hash(self) -> str:
+        """Hash the configuration file, re-reading it only when its mtime or size changed"""
+        st = os.stat(self.config_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._config_stat_cache and self._config_hash_cache:
+            return self._config_hash_cache
+        return self._single_flight('_hash_inflight', lambda: self._hash_config_file(stamp))
+        
+    def _hash_config_file(self, stamp: tuple) -> str:
+        """Read and hash the configuration file, caching the digest under its stat stamp"""
+        with open(self.config_path, 'rb') as f:
+            data = f.read()
+            
+        digest = self._digest(data, self.config)
+        self._config_stat_cache = stamp
+        self._config_hash_cache = digest
+        return digest
+        
+    @staticmethod
+    def _digest(data: bytes, config: dict) -> str:
+        """Digest configuration file content with the algorithm the config selects"""
+        # Change detection only, so the fastest available digest is enough
+        if config.get('replication', {}).get('legacy_hash', False):
+            return hashlib.sha256(data).hexdigest()
+        if xxhash:
+            return xxhash.xxh3_64_hexdigest(data)
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+        
+    def check_config_changes(self) -> bool:
+        """Reload the configuration if the file changed since it was last loaded"""
+        try:
+            st = os.stat(self.config_path)
+        except OSError as e:
+            logging.warning(f"Cannot stat configuration file: {e}")
+            return False
+            
+        # Same mtime and size as the loaded file: nothing to read or hash, and no lock needed
+        if (st.st_mtime_ns, st.st_size) == self._loaded_config_stamp:
+            return False
+        return self._single_flight('_reload_inflight', self._reload_if_changed)
+        
+    def _reload_if_changed(self) -> bool:
+        """Reload the configuration when its content hash differs from the loaded one"""
+        current_hash = self._get_config_hash()
+        if current_hash == self._loaded_config_hash:
+            # Touched but identical: move the loaded stamp forward so the fast path applies again
+            self._loaded_config_stamp = self._config_stat_cache
+            return False
+            
+        # load_config records the stamp and hash of the content it actually parsed
+        self.config = self.load_config()
+        logging.info("Configuration change detected and reloaded")
+        return True
         
     def setup_logging(self):
         """Setup logging"""
@@ -66,9 +177,10 @@ class ReplicationManager:
 
     # Connection management
     
-    def get_connection_string(self, host: str, port: int, uid: str, pwd: str, database: str = None) -> str:
+    def get_connection_string(self, host: str, port: int, uid: str, pwd: str, database: str = None,
+                              timeout: int = None) -> str:
         """Generate ODBC connection string"""
-        timeout = self.config.get('replication', {}).get('connection_timeout', 30)
+        timeout = timeout or self.config.get('replication', {}).get('connection_timeout', 30)
         
         conn_str = (
             f"DRIVER={{ODBC Driver 17 for SQL Server}};"
@@ -84,8 +196,9 @@ class ReplicationManager:
             
         return conn_str
         
-    def get_connection(self, host: str, port: int, uid: str, pwd: str, database: str = None) -> pyodbc.Connection:
-        """Get database connection"""
+    def get_connection(self, host: str, port: int, uid: str, pwd: str, database: str = None,
+                       timeout: int = None) -> pyodbc.Connection:
+        """Get database connection (timeout overrides the configured login timeout)"""
         pool_key = f"{host}:{port}:{database or 'master'}"
         
         # Check existing connection
@@ -100,19 +213,21 @@ class ReplicationManager:
                 del self.connection_pool[pool_key]
         
         # Create new connection
-        conn_str = self.get_connection_string(host, port, uid, pwd, database)
-        conn = pyodbc.connect(conn_str, autocommit=True)
+        conn_str = self.get_connection_string(host, port, uid, pwd, database, timeout)
+        login_timeout = {'timeout': timeout} if timeout else {}
+        conn = pyodbc.connect(conn_str, autocommit=True, **login_timeout)
         self.connection_pool[pool_key] = conn
         return conn
             
     def execute_query(self, host: str, port: int, uid: str, pwd: str, database: str, sql: str, 
-                     params: tuple = None, fetch: bool = False):
-        """Execute query with basic retry logic"""
-        retry_attempts = self.config.get('replication', {}).get('retry_attempts', 3)
+                     params: tuple = None, fetch: bool = False, retry_attempts: int = None,
+                     connection_timeout: int = None):
+        """Execute query with basic retry logic (retry_attempts and connection_timeout override the config)"""
+        retry_attempts = retry_attempts or self.config.get('replication', {}).get('retry_attempts', 3)
         
         for attempt in range(retry_attempts):
             try:
-                conn = self.get_connection(host, port, uid, pwd, database)
+                conn = self.get_connection(host, port, uid, pwd, database, connection_timeout)
                 cursor = conn.cursor()
                 
                 if params:
@@ -152,8 +267,38 @@ class ReplicationManager:
                 else:
                     raise
                     
+    def _get_replica_conn(self, db_config: dict) -> pyodbc.Connection:
+        """Get a per-thread connection opened directly against the configured database"""
+        conns = getattr(self._thread_local, 'connections', None)
+        if conns is None:
+            conns = self._thread_local.connections = {}
+            
+        pool_key = f"{db_config['host']}:{db_config['port']}:{db_config['database']}"
+        conn = conns.get(pool_key)
+        if conn is None:
+            conn_str = self.get_connection_string(
+                db_config['host'], db_config['port'], db_config['username'], 
+                db_config['password'], db_config['database']
+            )
+            conn = pyodbc.connect(conn_str, autocommit=False)
+            conns[pool_key] = conn
+            with self._thread_conns_lock:
+                self._thread_conns.append(conn)
+        return conn
+        
+    def _close_thread_connections(self):
+        """Close the per-thread connections opened by worker threads"""
+        with self._thread_conns_lock:
+            thread_conns, self._thread_conns = self._thread_conns, []
+        for conn in thread_conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+                
     def close_connections(self):
         """Close all pooled connections"""
+        self._close_thread_connections()
         for conn in self.connection_pool.values():
             try:
                 conn.close()
@@ -197,6 +342,153 @@ class ReplicationManager:
         )
         return [r[0] for r in rows] if rows else []
             
+    def _prefetch_schema_metadata(self, master: dict, schemas: list, 
+                                  categories: tuple = ('columns', 'primary_keys', 'indexes', 'foreign_keys'),
+                                  retry_attempts: int = None, connection_timeout: int = None) -> dict:
+        """Prefetch columns, primary keys, indexes and foreign keys for the configured tables, one query set per schema"""
+        def fetch(sql, params):
+            return self.execute_query(
+                master['host'], master['port'], master['username'], master['password'], 
+                master['database'], sql, params, fetch=True,
+                retry_attempts=retry_attempts, connection_timeout=connection_timeout
+            ) or []
+            
+        # Group the tables scheduled for replication by schema so each schema is one batch
+        tables_by_schema = {}
+        for schema in schemas:
+            for table_config in schema['tables']:
+                if table_config.get('replicate', True):
+                    tables_by_schema.setdefault(schema['schema_name'], []).append(table_config['table_name'])
+                    
+        # Columns and primary keys keep the shape of get_table_columns / get_primary_key.
+        # Indexes are (name, is_unique, is_clustered, columns) and foreign keys are
+        # (name, ref_schema, ref_table, ref_columns, columns); those column lists come
+        # pre-quoted from STRING_AGG ... WITHIN GROUP, which needs SQL Server 2017 or later
+        columns_sql = '''
+        SELECT c.TABLE_SCHEMA, c.TABLE_NAME,
+               c.COLUMN_NAME, c.DATA_TYPE, c.CHARACTER_MAXIMUM_LENGTH,
+               c.NUMERIC_PRECISION, c.NUMERIC_SCALE, c.IS_NULLABLE,
+               COLUMNPROPERTY(OBJECT_ID(QUOTENAME(c.TABLE_SCHEMA) + '.' + QUOTENAME(c.TABLE_NAME)), c.COLUMN_NAME, 'IsIdentity') AS IS_IDENTITY,
+               COLUMN_DEFAULT
+        FROM INFORMATION_SCHEMA.COLUMNS c
+        JOIN INFORMATION_SCHEMA.TABLES t 
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME AND t.TABLE_TYPE = 'BASE TABLE'
+        WHERE c.TABLE_SCHEMA = ? AND c.TABLE_NAME IN ({names})
+        ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+        '''
+        pk_sql = '''
+        SELECT k.TABLE_SCHEMA, k.TABLE_NAME, k.COLUMN_NAME
+        FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS t
+        JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE k ON t.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+        WHERE t.CONSTRAINT_TYPE = 'PRIMARY KEY' AND k.TABLE_SCHEMA = ? AND k.TABLE_NAME IN ({names})
+        ORDER BY k.TABLE_SCHEMA, k.TABLE_NAME, k.ORDINAL_POSITION
+        '''
+        indexes_sql = '''
+        SELECT s.name, o.name, i.name, i.is_unique, 
+               CASE WHEN i.type_desc = 'CLUSTERED' THEN 1 ELSE 0 END AS is_clustered,
+               STRING_AGG(QUOTENAME(c.name), ',') WITHIN GROUP (ORDER BY ic.key_ordinal) AS columns
+        FROM sys.indexes i
+        JOIN sys.objects o ON o.object_id = i.object_id AND o.type = 'U'
+        JOIN sys.schemas s ON s.schema_id = o.schema_id
+        JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 0
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.is_primary_key = 0 AND i.is_hypothetical = 0 AND i.name IS NOT NULL
+          AND s.name = ? AND o.name IN ({names})
+        GROUP BY s.name, o.name, i.name, i.is_unique, i.type_desc
+        '''
+        fks_sql = '''
+        SELECT ps.name, pt.name, fk.name, rs.name, rt.name,
+               STRING_AGG(QUOTENAME(rc.name), ',') WITHIN GROUP (ORDER BY fkc.constraint_column_id) AS ref_columns,
+               STRING_AGG(QUOTENAME(pc.name), ',') WITHIN GROUP (ORDER BY fkc.constraint_column_id) AS columns
+        FROM sys.foreign_keys fk
+        JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+        JOIN sys.tables pt ON pt.object_id = fk.parent_object_id
+        JOIN sys.schemas ps ON ps.schema_id = pt.schema_id
+        JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id
+        JOIN sys.tables rt ON rt.object_id = fk.referenced_object_id
+        JOIN sys.schemas rs ON rs.schema_id = rt.schema_id
+        JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+        WHERE ps.name = ? AND pt.name IN ({names})
+        GROUP BY ps.name, pt.name, fk.name, rs.name, rt.name
+        '''
+        
+        queries = {
+            'columns': columns_sql, 'primary_keys': pk_sql, 
+            'indexes': indexes_sql, 'foreign_keys': fks_sql,
+        }
+        cache = {category: {} for category in categories}
+        for schema_name, table_names in tables_by_schema.items():
+            # Chunks of 1000 names keep each query under SQL Server's 2100-parameter limit
+            for start in range(0, len(table_names), 1000):
+                chunk = table_names[start:start + 1000]
+                names = ', '.join('?' * len(chunk))
+                params = (schema_name, *chunk)
+                
+                for category in categories:
+                    for row in fetch(queries[category].format(names=names), params):
+                        # Primary keys are plain column names; everything else keeps its row tuple
+                        value = row[2] if category == 'primary_keys' else tuple(row[2:])
+                        cache[category].setdefault((row[0], row[1]), []).append(value)
+                        
+        self._schema_cache.update(cache)
+        return self._schema_cache
+        
+    def phase1_schema_only(self, master: dict, schemas: list, 
+                           retry_attempts: int = None, connection_timeout: int = None) -> dict:
+        """Fetch only the metadata table creation needs (columns and primary keys)"""
+        return self._prefetch_schema_metadata(
+            master, schemas, ('columns', 'primary_keys'), retry_attempts, connection_timeout
+        )
+        
+    def phase2_constraints(self, master: dict, replicas: list):
+        """Create indexes and foreign keys for tables created in phase 1, after the initial snapshot is delivered"""
+        with self._pending_lock:
+            pending, self._pending_constraints = self._pending_constraints, {}
+        pending = {name: tables for name, tables in pending.items() if tables}
+        if not pending:
+            return
+            
+        # Secondary metadata is fetched only now, for just the tables that were created
+        created = sorted({table for tables in pending.values() for table in tables})
+        schemas = {}
+        for schema_name, table_name in created:
+            schemas.setdefault(schema_name, []).append({'table_name': table_name})
+        cache = self._prefetch_schema_metadata(
+            master, [{'schema_name': name, 'tables': tables} for name, tables in schemas.items()],
+            ('indexes', 'foreign_keys')
+        )
+        
+        def apply(replica):
+            idx_scripts, fk_scripts = [], []
+            for schema_name, table_name in pending[replica['name']]:
+                key = (schema_name, table_name)
+                idx_scripts.extend(self.build_create_indexes_script(cache['indexes'].get(key, []), schema_name, table_name))
+                scripts = [self.build_fk_script(fk, schema_name, table_name) for fk in cache['foreign_keys'].get(key, [])]
+                fk_scripts.extend(fk for fk in scripts if fk)  # Filter None values
+            self._apply_index_scripts(replica, idx_scripts)
+            # Foreign keys go last so every referenced table and index already exists
+            self._apply_fk_scripts(replica, fk_scripts)
+            
+        targets = [replica for replica in replicas if replica['name'] in pending]
+        try:
+            with ThreadPoolExecutor(max_workers=min(32, len(targets) or 1)) as executor:
+                list(executor.map(apply, targets))
+        finally:
+            # The worker threads are gone, so their connections can never be reused
+            self._close_thread_connections()
+        
+    def get_table_row_count(self, db_config: dict, schema: str, table: str) -> int:
+        """Get table row count from partition stats (metadata only, no table scan)"""
+        sql = '''
+        SELECT SUM(row_count) FROM sys.dm_db_partition_stats 
+        WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+        '''
+        # Called from the table workers, so it uses the calling thread's own connection
+        conn = self._get_replica_conn(db_config)
+        count = conn.cursor().execute(sql, f"[{schema}].[{table}]").fetchval()
+        conn.commit()
+        return int(count or 0)
+            
     def table_exists(self, db_config: dict, schema: str, table: str) -> bool:
         """Check if table exists"""
         sql = '''
@@ -212,6 +504,25 @@ class ReplicationManager:
         except Exception:
             return False
             
+    def _load_existing_tables(self, db_config: dict) -> set:
+        """Load (schema, table) pairs present on a database, cached per database name"""
+        with self._existing_tables_lock:
+            cached = self._existing_tables_cache.get(db_config['name'])
+        if cached is not None:
+            return cached
+            
+        # Query outside the lock so replicas load concurrently; a racing worker's result is discarded
+        sql = '''
+        SELECT TABLE_SCHEMA, TABLE_NAME FROM INFORMATION_SCHEMA.TABLES 
+        WHERE TABLE_TYPE = 'BASE TABLE'
+        '''
+        conn = self._get_replica_conn(db_config)
+        cursor = conn.cursor()
+        rows = cursor.execute(sql).fetchall()
+        conn.commit()
+        with self._existing_tables_lock:
+            return self._existing_tables_cache.setdefault(db_config['name'], {(r[0], r[1]) for r in rows})
+            
 
 
 
@@ -245,6 +556,29 @@ class ReplicationManager:
             pk_sql = f", CONSTRAINT [{pk_constraint_name}] PRIMARY KEY ({pk_cols_quoted})"
 
         return f"CREATE TABLE [{schema}].[{table}] ({', '.join(col_defs)}{pk_sql})";
+        
+    def build_create_indexes_script(self, indexes, schema: str, table: str) -> List[str]:
+        """Build CREATE INDEX scripts from cached (name, is_unique, is_clustered, columns) rows"""
+        scripts = []
+        for name, is_unique, is_clustered, columns in indexes:
+            kind = ('UNIQUE ' if is_unique else '') + ('CLUSTERED' if is_clustered else 'NONCLUSTERED')
+            scripts.append(
+                f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(N'[{schema}].[{table}]') AND name = N'{name}') "
+                f"CREATE {kind} INDEX [{name}] ON [{schema}].[{table}] ({columns})"
+            )
+        return scripts
+        
+    def build_fk_script(self, fk, schema: str, table: str) -> str:
+        """Build an ADD CONSTRAINT script from a cached (name, ref_schema, ref_table, ref_columns, columns) row"""
+        name, ref_schema, ref_table, ref_columns, columns = fk
+        if not columns or not ref_columns:
+            return None
+            
+        return (
+            f"IF OBJECT_ID(N'[{schema}].[{name}]', 'F') IS NULL "
+            f"ALTER TABLE [{schema}].[{table}] ADD CONSTRAINT [{name}] "
+            f"FOREIGN KEY ({columns}) REFERENCES [{ref_schema}].[{ref_table}] ({ref_columns})"
+        )
             
 
 
@@ -376,8 +710,10 @@ class ReplicationManager:
 
     def add_article(self, master: dict, publication_name: str, schema: str, table: str):
         """Add article to publication"""
-        # Validate primary key exists
-        pk = self.get_primary_key(master, schema, table)
+        # Validate primary key exists (phase 1 has usually cached it already)
+        pk = self._schema_cache.get('primary_keys', {}).get((schema, table))
+        if pk is None:
+            pk = self.get_primary_key(master, schema, table)
         if not pk:
             raise RuntimeError(f"Table {schema}.{table} has no primary key")
             
@@ -418,11 +754,15 @@ class ReplicationManager:
         self.logger.info(f"Article {schema}.{table} added to publication")
             
     def create_push_subscription(self, master: dict, publication_name: str, subscriber: dict, 
-                                distributor_login: str, distributor_password: str, sync_interval_seconds: int):
+                                distributor_login: str, distributor_password: str, sync_interval_seconds: int,
+                                continuous: bool = False, subscription_streams: int = 4):
         """Create push subscription with enhanced error handling and optimization"""
         try:
             self.logger.info(f'Creating push subscription to {subscriber["host"]}:{subscriber["port"]}/{subscriber["database"]}')
             
+            # Continuous agents apply commands over several parallel subscriber connections
+            streams_option = f",\n                    @subscriptionstreams = {int(subscription_streams)}" if continuous else ""
+            
             # Create subscription
             sql_subscription = f"""
             IF NOT EXISTS (SELECT * FROM syssubscriptions s 
@@ -436,11 +776,11 @@ class ReplicationManager:
                     @destination_db = N'{subscriber['database']}', 
                     @subscription_type = N'Push', 
                     @sync_type = N'automatic', 
-                    @article = N'all';
+                    @article = N'all'{streams_option};
             END
             """
             
-            self.execute_query_with_retry(
+            self.execute_query(
                 master['host'], master['port'], master['username'], master['password'], 
                 master['database'], sql_subscription
             )
@@ -448,6 +788,17 @@ class ReplicationManager:
             # Create distribution agent with optimized settings
             freq_subday_interval = max(1, int(sync_interval_seconds))
             
+            if continuous:
+                # 64 = start automatically with SQL Server Agent and run continuously
+                schedule = "@frequency_type = 64,"
+            else:
+                schedule = f"""@frequency_type = 4,
+                @frequency_interval = 1,
+                @frequency_relative_interval = 1,
+                @frequency_recurrence_factor = 0,
+                @frequency_subday = 4,
+                @frequency_subday_interval = {freq_subday_interval},"""
+            
             sql_agent = f"""
             EXEC sp_addpushsubscription_agent 
                 @publication = N'{publication_name}', 
@@ -456,24 +807,22 @@ class ReplicationManager:
                 @job_login = N'{distributor_login}', 
                 @job_password = N'{distributor_password}', 
                 @subscriber_security_mode = 1,
-                @frequency_type = 4,
-                @frequency_interval = 1,
-                @frequency_relative_interval = 1,
-                @frequency_recurrence_factor = 0,
-                @frequency_subday = 4,
-                @frequency_subday_interval = {freq_subday_interval},
+                {schedule}
                 @active_start_time_of_day = 0,
                 @active_end_time_of_day = 235959,
                 @enabled_for_syncmgr = N'False',
                 @dts_package_location = N'Distributor';
             """
             
-            self.execute_query_with_retry(
+            self.execute_query(
                 master['host'], master['port'], master['username'], master['password'], 
                 master['database'], sql_agent
             )
             
-            self.logger.info(f"Push subscription agent created with {sync_interval_seconds}s interval")
+            if continuous:
+                self.logger.info(f"Push subscription agent created in continuous mode ({subscription_streams} streams)")
+            else:
+                self.logger.info(f"Push subscription agent created with {sync_interval_seconds}s interval")
             
         except Exception as e:
             self.logger.warning(f'Failed to create push subscription agent: {e}')
@@ -555,6 +904,14 @@ class ReplicationManager:
         # Start snapshot
         self.start_snapshot(master, publication_name)
         
+        # Secondary structures (indexes, FKs) for tables created during setup. The snapshot
+        # drops and recreates subscriber tables (pre_creation_cmd = drop), so they must wait for it
+        if self.wait_for_initial_sync(master, publication_name):
+            self.phase2_constraints(master, replicas)
+        else:
+            self.logger.warning("Initial snapshot not delivered yet; indexes and foreign keys stay pending "
+                                "until phase2_constraints is run again")
+        
         self.logger.info('Replication setup completed!')
     
     def setup_replicas(self, replicas: list, distributor_password: str):
@@ -581,88 +938,26 @@ class ReplicationManager:
             )
             
     def process_tables(self, master: dict, replicas: list, schemas: list, publication_name: str):
-        """Process tables and create them on replicas"""
+        """Process tables, create them on replicas, and add articles"""
+        self._process_tables_and_articles(master, replicas, schemas, publication_name, self.config['replication'])
+        
+        # Articles are added serially: they all go through the one master connection
         for schema in schemas:
             for table_config in schema['tables']:
-                if not table_config.get('replicate', True):
-                    continue
-                    
-                table_name = table_config['table_name']
-                self.logger.info(f'Processing table {schema["schema_name"]}.{table_name}')
-                
-                # Validate primary key
-                pk = self.get_primary_key(master, schema['schema_name'], table_name)
-                if not pk:
-                    raise RuntimeError(f"Table {schema['schema_name']}.{table_name} missing primary key")
-                    
-                # Get table structure
-                columns = self.get_table_columns(master, schema['schema_name'], table_name)
-                
-                # Create table on replicas
-                create_table_sql = self.build_create_table_script(columns, pk, schema['schema_name'], table_name)
-                
-                for replica in replicas:
-                    if not self.table_exists(replica, schema['schema_name'], table_name):
-                        full_sql = f"USE [{replica['database']}]; {create_table_sql};"
-                        self.execute_query(
-                            replica['host'], replica['port'], replica['username'], 
-                            replica['password'], replica['database'], full_sql
-                        )
-                        self.logger.info(f"Table {schema['schema_name']}.{table_name} created on {replica['name']}")
-                        
-                # Add article to publication
-                self.add_article(master, publication_name, schema['schema_name'], table_name)
-        """Setup replica databases in parallel for better performance"""
-        def setup_single_replica(replica):
-            try:
-                # Create database if missing
-                if rep_cfg.get('auto_setup_replicas', True):
-                    self.ensure_database_exists(replica, replica['database'])
-                    
-                # Setup distributor login on replica
-                distributor_password = rep_cfg.get('distributor_admin_password', 'DistributorPassword!123')
-                self.ensure_login_exists(replica, 'distributor_admin', distributor_password)
-                
-                # Create user and assign permissions
-                sql_user = f"""
-                USE [{replica['database']}];
-                IF NOT EXISTS (SELECT name FROM sys.database_principals WHERE name = 'distributor_admin')
-                BEGIN
-                    CREATE USER [distributor_admin] FOR LOGIN [distributor_admin];
-                    EXEC sp_addrolemember N'db_owner', N'distributor_admin';
-                END
-                """
-                self.execute_query_with_retry(
-                    replica['host'], replica['port'], replica['username'], replica['password'],
-                    replica['database'], sql_user
-                )
-                
-                self.logger.info(f"Replica {replica['name']} setup completed")
-                return replica['name'], True
-                
-            except Exception as e:
-                self.logger.error(f"Failed to setup replica {replica['name']}: {e}")
-                return replica['name'], False
-                
-        # Use thread pool for parallel setup
-        max_workers = min(len(replicas), 4)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(setup_single_replica, replica) for replica in replicas]
-            
-            for future in as_completed(futures):
-                replica_name, success = future.result()
-                if not success:
-                    raise Exception(f"Failed to setup replica {replica_name}")
+                if table_config.get('replicate', True):
+                    self.add_article(master, publication_name, schema['schema_name'], table_config['table_name'])
                     
     def _process_tables_and_articles(self, master: dict, replicas: list, schemas: list, 
                                    publication_name: str, rep_cfg: dict):
-        """Process tables, create schema/tables on replicas, and add articles"""
+        """Process tables and create schemas/tables on replicas (articles are added by process_tables)"""
         create_missing_tables = rep_cfg.get('create_missing_tables', True)
         create_missing_schemas = rep_cfg.get('create_missing_schemas', True)
         use_backup_restore = rep_cfg.get('use_backup_restore_init', False)
         
-        # Collect FK scripts to apply after all tables are created
-        fk_scripts_by_replica = {r['name']: [] for r in replicas}
+        table_jobs = []
+        
+        # Phase 1: only columns and primary keys; indexes and FKs wait for phase2_constraints
+        schema_cache = self.phase1_schema_only(master, schemas)
         
         for schema in schemas:
             for table_config in schema['tables']:
@@ -670,84 +965,158 @@ class ReplicationManager:
                     continue
                     
                 table_name = table_config['table_name']
-                self.logger.info(f'Processing table {schema["schema_name"]}.{table_name}')
+                self.logger.info('Processing table %s.%s', schema['schema_name'], table_name)
+                
+                key = (schema['schema_name'], table_name)
                 
                 # Validate primary key
-                pk = self.get_primary_key(master, schema['schema_name'], table_name)
+                pk = schema_cache['primary_keys'].get(key, [])
                 if not pk:
                     raise RuntimeError(f"Table {schema['schema_name']}.{table_name} missing primary key")
                     
                 # Get table structure from master
-                columns = self.get_table_columns(master, schema['schema_name'], table_name)
-                indexes = self.get_indexes(master, schema['schema_name'], table_name)
-                fks = self.get_foreign_keys(master, schema['schema_name'], table_name)
+                columns = schema_cache['columns'].get(key, [])
                 
-                # Build scripts
+                # Build script
                 create_table_sql = self.build_create_table_script(columns, pk, schema['schema_name'], table_name)
-                idx_scripts = self.build_create_indexes_script(indexes, schema['schema_name'], table_name)
-                fk_scripts = [self.build_fk_script(fk, schema['schema_name'], table_name) for fk in fks]
-                fk_scripts = [fk for fk in fk_scripts if fk]  # Filter None values
                 
-                # Create schema and table on each replica
-                for replica in replicas:
-                    try:
-                        # Create schema if missing
-                        if create_missing_schemas and schema['schema_name'] != 'dbo':
-                            schema_sql = f"""
-                            USE [{replica['database']}];
-                            IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = N'{schema['schema_name']}')
-                            BEGIN
-                                EXEC('CREATE SCHEMA [{schema["schema_name"]}]');
-                            END
-                            """
-                            self.execute_query_with_retry(
-                                replica['host'], replica['port'], replica['username'], 
-                                replica['password'], replica['database'], schema_sql
-                            )
-                            
-                        # Create table if missing
-                        if create_missing_tables:
-                            if not self.table_exists(replica, schema['schema_name'], table_name):
-                                full_create_sql = f"USE [{replica['database']}]; {create_table_sql};"
-                                self.execute_query_with_retry(
-                                    replica['host'], replica['port'], replica['username'], 
-                                    replica['password'], replica['database'], full_create_sql
-                                )
-                                
-                                # Create indexes
-                                for idx_sql in idx_scripts:
-                                    try:
-                                        full_idx_sql = f"USE [{replica['database']}]; {idx_sql}"
-                                        self.execute_query_with_retry(
-                                            replica['host'], replica['port'], replica['username'], 
-                                            replica['password'], replica['database'], full_idx_sql
-                                        )
-                                    except Exception as e:
-                                        self.logger.warning(f"Failed to create index on {replica['name']}: {e}")
-                                        
-                                # Store FK scripts for later
-                                for fk_sql in fk_scripts:
-                                    fk_scripts_by_replica[replica['name']].append(
-                                        (replica, f"USE [{replica['database']}]; {fk_sql}")
-                                    )
-                                    
-                                self.logger.info(f"Table {schema['schema_name']}.{table_name} created on {replica['name']}")
-                                
-                        # Handle large table optimization
-                        if use_backup_restore:
-                            self.initialize_large_table_with_backup(master, replica, schema['schema_name'], table_name)
-                            
-                    except Exception as e:
-                        self.logger.error(f"Failed to create table {schema['schema_name']}.{table_name} on {replica['name']}: {e}")
-                        raise
+                table_jobs.append((schema['schema_name'], table_name, create_table_sql))
+                
+        if not table_jobs or not replicas:
+            return
+            
+        # Replicas are independent and the work is I/O-bound, so fan out across them
+        max_workers = min(32, len(replicas))
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Create schemas up front so concurrent table tasks never race on CREATE SCHEMA
+                if create_missing_schemas:
+                    schema_names = sorted({job[0] for job in table_jobs if job[0] != 'dbo'})
+                    futures = [
+                        executor.submit(self._create_schemas_on_replica, replica, schema_names)
+                        for replica in replicas
+                    ]
+                    for future in futures:
+                        future.result()
                         
+                futures = [
+                    executor.submit(
+                        self._create_table_on_replica, master, replica, schema_name, table_name,
+                        create_table_sql, create_missing_tables, use_backup_restore
+                    )
+                    for schema_name, table_name, create_table_sql in table_jobs
+                    for replica in replicas
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            self._close_thread_connections()
+                
+    def _create_schemas_on_replica(self, replica: dict, schema_names: list):
+        """Create missing schemas on a single replica"""
+        for schema_name in schema_names:
+            schema_sql = f"""
+            IF NOT EXISTS (SELECT 1 FROM sys.schemas WHERE name = N'{schema_name}')
+            BEGIN
+                EXEC('CREATE SCHEMA [{schema_name}]');
+            END
+            """
+            try:
+                conn = self._get_replica_conn(replica)
+                conn.cursor().execute(schema_sql)
+                conn.commit()
+            except Exception as e:
+                self.logger.error("Failed to create schema %s on %s: %s", schema_name, replica['name'], e)
+                raise
+                
+    def _create_table_on_replica(self, master: dict, replica: dict, schema_name: str, table_name: str,
+                                 create_table_sql: str, create_missing_tables: bool, use_backup_restore: bool):
+        """Create a single table on a single replica; its indexes and FKs are deferred to phase 2"""
+        try:
+            existing_tables = self._load_existing_tables(replica)
+            table_existed = (schema_name, table_name) in existing_tables
+            
+            # Create table if missing
+            if create_missing_tables:
+                if not table_existed:
+                    conn = self._get_replica_conn(replica)
+                    cursor = conn.cursor()
+                    cursor.execute(create_table_sql)
+                    conn.commit()
+                    
+                    # Keep the cache coherent without another round-trip
+                    existing_tables.add((schema_name, table_name))
+                    
+                    # Indexes and FKs for this table are created by phase2_constraints
+                    with self._pending_lock:
+                        self._pending_constraints.setdefault(replica['name'], []).append((schema_name, table_name))
+                        
+                    self.logger.info("Table %s.%s created on %s", schema_name, table_name, replica['name'])
+                    
+            # Handle large table optimization (only for tables that started out missing)
+            if use_backup_restore and not table_existed:
+                self.initialize_large_table_with_backup(master, replica, schema_name, table_name)
+                
+        except Exception as e:
+            self.logger.error("Failed to create table %s.%s on %s: %s", schema_name, table_name, replica['name'], e)
+            raise
+                        
+    def _apply_index_scripts(self, replica: dict, idx_scripts: list):
+        """Create indexes on a replica one at a time, logging (not raising) individual failures"""
+        if not idx_scripts:
+            return
+            
+        conn = self._get_replica_conn(replica)
+        cursor = conn.cursor()
+        for idx_sql in idx_scripts:
+            try:
+                cursor.execute(idx_sql)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self.logger.warning("Failed to create index on %s: %s", replica['name'], e)
+                
+    def _apply_fk_scripts(self, replica: dict, fk_scripts: list):
+        """Apply FK scripts on a replica in one batch, falling back to one at a time on error"""
+        if not fk_scripts:
+            return
+            
+        conn = self._get_replica_conn(replica)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(";\n".join(fk_scripts))
+            # Errors from statements after the first only surface while stepping through the batch
+            while cursor.nextset():
+                pass
+            conn.commit()
+            return
+        except Exception as e:
+            conn.rollback()
+            self.logger.warning("Batched FK creation failed on %s, retrying individually: %s", replica['name'], e)
+            
+        # Run statements individually to localize the failing constraint
+        for fk_sql in fk_scripts:
+            try:
+                cursor.execute(fk_sql)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self.logger.warning("Failed to create foreign key on %s: %s", replica['name'], e)
+                
     def create_subscriptions(self, master: dict, replicas: list, publication_name: str, distributor_password: str):
         """Create subscriptions for all replicas"""
+        sync_interval = self.config.get('replication', {}).get('sync_interval_seconds', 15)
+        subscription_streams = self.config.get('replication', {}).get('subscription_streams', 4)
+        
+        # Serial on purpose: every subscription is created through the same pooled master connection
         for replica in replicas:
             self.create_push_subscription(
                 master, publication_name, replica, 
-                'distributor_admin', distributor_password, sync_interval
+                'distributor_admin', distributor_password, sync_interval,
+                continuous=replica.get('async_replication', False),
+                subscription_streams=subscription_streams
             )
+            
     def start_snapshot(self, master: dict, publication_name: str):
         """Start snapshot generation"""
         try:
@@ -760,6 +1129,46 @@ class ReplicationManager:
         except Exception as e:
             self.logger.warning(f"Could not start snapshot: {e}")
         
+    def wait_for_initial_sync(self, master: dict, publication_name: str) -> bool:
+        """Poll with backoff until every subscription is active and the distributor backlog is empty"""
+        max_wait = self.config.get('replication', {}).get('initial_sync_timeout_seconds', 600)
+        # Subscriptions stay 'subscribed' (1) until their snapshot is applied, then turn 'active' (2);
+        # srvid < 0 marks the virtual subscriptions immediate_sync keeps
+        sql_status = '''
+        SELECT
+            (SELECT COUNT(*) FROM syssubscriptions s
+             JOIN sysarticles a ON a.artid = s.artid
+             JOIN syspublications p ON p.pubid = a.pubid
+             WHERE p.name = ? AND s.srvid >= 0 AND s.status <> 2),
+            (SELECT COALESCE(SUM(UndelivCmdsInDistDB), 0) FROM distribution.dbo.MSdistribution_status)
+        '''
+        deadline = time.monotonic() + max_wait
+        attempt = 0
+        while True:
+            try:
+                rows = self.execute_query(
+                    master['host'], master['port'], master['username'], master['password'], 
+                    master['database'], sql_status, (publication_name,), fetch=True, retry_attempts=1
+                )
+            except Exception as e:
+                self.logger.warning(f"Could not read snapshot delivery status: {e}")
+                return False
+                
+            inactive, pending = rows[0]
+            if not inactive and not pending:
+                self.logger.info("Initial snapshot delivered to all subscribers")
+                return True
+                
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning(f"Initial snapshot still in progress after {max_wait}s "
+                                    f"({inactive} subscriptions inactive, {pending} commands pending)")
+                return False
+                
+            self.logger.info(f"Waiting for initial snapshot ({inactive} subscriptions inactive, {pending} commands pending)...")
+            time.sleep(min(2 ** attempt, 5, remaining))
+            attempt += 1
+            
     def start(self):
         """Start the enhanced replication manager"""
         try:
@@ -768,14 +1177,11 @@ class ReplicationManager:
         except Exception as e:
             self.logger.error(f"Failed to start replication manager: {e}")
             raise
-        finally:
-            # Keep connections alive for monitoring
-            pass
             
     def stop(self):
         """Stop the replication manager and cleanup"""
         self.running = False
-        self.close_all_connections()
+        self.close_connections()
         self.logger.info("Replication manager stopped")
 
 
@@ -5,9 +5,25 @@ Test Script for DELETE Replication
 This script demonstrates how the enhanced replication manager handles DELETE operations.
 """
 
+import argparse
+import sys
 import pyodbc
 import time
 
+def fetch_employee_ids(conn_str):
+    """Stream all EmployeeIDs into a set without materializing full rows"""
+    ids = set()
+    with pyodbc.connect(conn_str) as conn:
+        cursor = conn.cursor()
+        cursor.arraysize = 10000
+        cursor.execute("SELECT EmployeeID FROM dbo.Employees")
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            ids.update(r[0] for r in rows)
+    return ids
+
 def test_delete_replication():
     """Test DELETE operations replication"""
     
@@ -55,11 +71,11 @@ def test_delete_replication():
             cursor = master_conn.cursor()
             # Delete the last 5 employees
             cursor.execute("""
-                DELETE TOP(5) FROM dbo.Employees 
-                WHERE EmployeeID IN (
-                    SELECT TOP(5) EmployeeID FROM dbo.Employees 
+                WITH victims AS (
+                    SELECT TOP(5) * FROM dbo.Employees 
                     ORDER BY EmployeeID DESC
                 )
+                DELETE FROM victims;
             """)
             deleted_count = cursor.rowcount
             master_conn.commit()
@@ -73,19 +89,21 @@ def test_delete_replication():
             print(f"Master Employees count after deletion: {master_count_after}")
         
         # Step 4: Wait for replication
-        print("\n3. Waiting for replication to sync (60 seconds)...")
+        print("\n3. Waiting for replication to sync (up to 60 seconds)...")
         print("   Make sure the enhanced replication manager is running!")
-        for i in range(60, 0, -10):
-            print(f"   Waiting {i} seconds...")
-            time.sleep(10)
-        
-        # Step 5: Check replica count after replication
-        print("\n4. Checking replica count after replication...")
-        
-        with pyodbc.connect(replica_conn_str) as replica_conn:
+
+        # Step 5: Poll the replica until it catches up (or the timeout expires)
+        with pyodbc.connect(replica_conn_str, autocommit=True) as replica_conn:
             cursor = replica_conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM dbo.Employees")
-            replica_count_after = cursor.fetchone()[0]
+            deadline = time.monotonic() + 60
+            while True:
+                cursor.execute("SELECT COUNT(*) FROM dbo.Employees")
+                replica_count_after = cursor.fetchone()[0]
+                if replica_count_after == master_count_after or time.monotonic() >= deadline:
+                    break
+                time.sleep(1)
+
+            print("\n4. Checking replica count after replication...")
             print(f"Replica Employees count after replication: {replica_count_after}")
         
         # Step 6: Verify DELETE replication
@@ -105,18 +123,8 @@ def test_delete_replication():
         # Step 7: Show detailed comparison
         print("\n6. Detailed record comparison:")
         
-        with pyodbc.connect(master_conn_str) as master_conn:
-            cursor = master_conn.cursor()
-            cursor.execute("SELECT EmployeeID, FirstName, LastName FROM dbo.Employees ORDER BY EmployeeID")
-            master_records = cursor.fetchall()
-        
-        with pyodbc.connect(replica_conn_str) as replica_conn:
-            cursor = replica_conn.cursor()
-            cursor.execute("SELECT EmployeeID, FirstName, LastName FROM dbo.Employees ORDER BY EmployeeID")
-            replica_records = cursor.fetchall()
-        
-        master_ids = {r[0] for r in master_records}
-        replica_ids = {r[0] for r in replica_records}
+        master_ids = fetch_employee_ids(master_conn_str)
+        replica_ids = fetch_employee_ids(replica_conn_str)
         
         missing_in_replica = master_ids - replica_ids
         extra_in_replica = replica_ids - master_ids
@@ -134,8 +142,16 @@ def test_delete_replication():
         print(f"Error during test: {e}")
         return False
 
-def main():
+def main(argv=None):
     """Main test function"""
+    parser = argparse.ArgumentParser(description="Test DELETE replication")
+    parser.add_argument('--yes', action='store_true', help="Run without the confirmation prompt")
+    args = parser.parse_args(argv)
+    
+    # Avoid per-print encode fallbacks (and UnicodeEncodeError) on legacy Windows consoles
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8')
+    
     print("DELETE Replication Test")
     print("=" * 50)
     print("This test will:")
@@ -145,10 +161,11 @@ def main():
     print("4. Verify the deletes were replicated")
     print()
     
-    response = input("Do you want to proceed? (y/N): ")
-    if response.lower() != 'y':
-        print("Test cancelled.")
-        return
+    if not args.yes:
+        response = input("Do you want to proceed? (y/N): ")
+        if response.lower() != 'y':
+            print("Test cancelled.")
+            return
     
     success = test_delete_replication()
     
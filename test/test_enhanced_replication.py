@@ -5,27 +5,58 @@ Enhanced Replication Test Runner
 This script tests the enhanced SQL Server replication manager with your specific configuration.
 """
 
+import argparse
+import functools
+import importlib.util
 import os
+import re
 import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+@functools.lru_cache(maxsize=1)
+def _sql_server_drivers():
+    """Return the installed SQL Server ODBC drivers, scanning only once per run"""
+    import pyodbc
+    return tuple(driver for driver in pyodbc.drivers() if 'SQL Server' in driver)
+
+def _split_go_batches(sql_text):
+    """Split a T-SQL script into batches on lines containing only GO"""
+    batches = re.split(r'^\s*GO\s*;?\s*$', sql_text, flags=re.MULTILINE | re.IGNORECASE)
+    return [batch.strip() for batch in batches if batch.strip()]
+
+@functools.lru_cache(maxsize=None)
+def _split_sql_file(path):
+    """Read and split a T-SQL script once per path"""
+    with open(path, 'r') as f:
+        return tuple(_split_go_batches(f.read()))
+
+def _execute_batches(cursor, batches):
+    """Send each batch in a single round-trip, warning on failures"""
+    for batch in batches:
+        try:
+            cursor.execute(batch)
+            # Drain remaining result sets so errors later in the batch surface here
+            while cursor.nextset():
+                pass
+        except Exception as e:
+            print(f"Warning: {e}")
 
 def check_dependencies():
     """Check if required dependencies are installed"""
-    try:
-        import pyodbc
-        import pandas as pd
-        print("✓ Required Python packages are installed")
-        return True
-    except ImportError as e:
-        print(f"✗ Missing required package: {e}")
+    # Locate the packages without importing them; pyodbc is only loaded when drivers are listed
+    missing = [name for name in ('pyodbc', 'pandas') if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"✗ Missing required package: No module named '{missing[0]}'")
         print("Please install dependencies with: pip install -r requirements.txt")
         return False
+    print("✓ Required Python packages are installed")
+    return True
 
 def check_sql_server_drivers():
     """Check if SQL Server ODBC drivers are available"""
     try:
-        import pyodbc
-        drivers = [driver for driver in pyodbc.drivers() if 'SQL Server' in driver]
+        drivers = list(_sql_server_drivers())
         if drivers:
             print(f"✓ SQL Server ODBC drivers found: {drivers}")
             return True
@@ -37,8 +68,8 @@ def check_sql_server_drivers():
         print(f"✗ Error checking ODBC drivers: {e}")
         return False
 
-def test_sql_connections():
-    """Test connections to SQL Server instances"""
+def test_sql_connections(connections=None):
+    """Test connections to SQL Server instances, keeping them open in `connections` if given"""
     print("Testing SQL Server connections...")
     
     # Test configurations from your provided setup
@@ -50,7 +81,8 @@ def test_sql_connections():
     
     import pyodbc
     
-    for config in test_configs:
+    def probe(config):
+        """Connect to one server and describe it; returns (config, conn, db_exists, error)"""
         try:
             conn_str = (
                 f"DRIVER={{ODBC Driver 17 for SQL Server}};"
@@ -61,33 +93,54 @@ def test_sql_connections():
                 f"TrustServerCertificate=yes;"
             )
             
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT @@SERVERNAME, @@VERSION")
-                result = cursor.fetchone()
-                print(f"✓ {config['name']} connection successful")
-                
-                # Check if target database exists
-                cursor.execute("SELECT name FROM sys.databases WHERE name = ?", config['database'])
-                db_exists = cursor.fetchone()
-                if db_exists:
-                    print(f"  └─ Database '{config['database']}' exists")
-                else:
-                    print(f"  └─ Database '{config['database']}' not found (will be created automatically)")
-                
+            conn = pyodbc.connect(conn_str, timeout=10)
+            cursor = conn.cursor()
+            # Server identity and target database existence in a single round-trip
+            cursor.execute(
+                "SELECT @@SERVERNAME, @@VERSION, "
+                "CAST(CASE WHEN EXISTS(SELECT 1 FROM sys.databases WHERE name = ?) THEN 1 ELSE 0 END AS bit)",
+                config['database']
+            )
+            _, _, db_exists = cursor.fetchone()
+            return config, conn, bool(db_exists), None
+            
         except Exception as e:
-            print(f"✗ {config['name']} connection failed: {e}")
-            return False
+            return config, None, False, e
     
-    return True
+    # Servers are independent, so the total wait is the slowest probe rather than the sum
+    with ThreadPoolExecutor(max_workers=len(test_configs)) as executor:
+        results = list(executor.map(probe, test_configs))
+    
+    all_ok = True
+    for config, conn, db_exists, error in results:
+        if error is not None:
+            print(f"✗ {config['name']} connection failed: {error}")
+            all_ok = False
+            continue
+            
+        print(f"✓ {config['name']} connection successful")
+        if db_exists:
+            print(f"  └─ Database '{config['database']}' exists")
+        else:
+            print(f"  └─ Database '{config['database']}' not found (will be created automatically)")
+            
+        if connections is not None:
+            connections[config['name']] = conn
+        else:
+            conn.close()
+    
+    return all_ok
 
-def run_master_setup():
-    """Offer to run master database setup"""
+def run_master_setup(master_conn=None, assume_yes=False, skip_dummy=False):
+    """Offer to run master database setup, reusing `master_conn` when provided"""
     print("\n" + "=" * 60)
     print("Master Database Setup")
     print("=" * 60)
     
-    response = input("Do you want to run the master database setup script? (y/N): ")
+    if assume_yes:
+        response = 'y'
+    else:
+        response = input("Do you want to run the master database setup script? (y/N): ")
     if response.lower() == 'y':
         try:
             import pyodbc
@@ -98,8 +151,7 @@ def run_master_setup():
                 print(f"Setup script not found: {setup_script_path}")
                 return False
             
-            with open(setup_script_path, 'r') as f:
-                setup_sql = f.read()
+            setup_batches = _split_sql_file(setup_script_path)
             
             # Connect to master database server
             conn_str = (
@@ -112,47 +164,33 @@ def run_master_setup():
             )
             
             print("Executing master database setup...")
-            with pyodbc.connect(conn_str, timeout=30) as conn:
-                # Split script by GO statements
-                statements = setup_sql.split('GO')
-                cursor = conn.cursor()
+            conn = master_conn or pyodbc.connect(conn_str, timeout=30)
+            with conn:
+                # DDL auto-commits, so skip an explicit commit round-trip per batch
+                conn.autocommit = True
+                _execute_batches(conn.cursor(), setup_batches)
                 
-                for statement in statements:
-                    statement = statement.strip()
-                    if statement:
-                        try:
-                            cursor.execute(statement)
-                            cursor.commit()
-                        except Exception as e:
-                            print(f"Warning: {e}")
-                            
             print("✓ Master database setup completed")
             
             # Ask about dummy data
-            response = input("Do you want to insert dummy data? (y/N): ")
+            if skip_dummy:
+                response = 'n'
+            elif assume_yes:
+                response = 'y'
+            else:
+                response = input("Do you want to insert dummy data? (y/N): ")
             if response.lower() == 'y':
                 dummy_script_path = 'insert_dummy_data.sql'
                 if os.path.exists(dummy_script_path):
-                    with open(dummy_script_path, 'r') as f:
-                        dummy_sql = f.read()
+                    dummy_batches = _split_sql_file(dummy_script_path)
                     
                     # Connect to askd database
                     conn_str = conn_str.replace("DATABASE=master;", "DATABASE=askd;")
                     
                     print("Inserting dummy data...")
-                    with pyodbc.connect(conn_str, timeout=30) as conn:
-                        statements = dummy_sql.split('GO')
-                        cursor = conn.cursor()
+                    with pyodbc.connect(conn_str, timeout=30, autocommit=True) as conn:
+                        _execute_batches(conn.cursor(), dummy_batches)
                         
-                        for statement in statements:
-                            statement = statement.strip()
-                            if statement:
-                                try:
-                                    cursor.execute(statement)
-                                    cursor.commit()
-                                except Exception as e:
-                                    print(f"Warning: {e}")
-                                    
                     print("✓ Dummy data inserted successfully")
                 else:
                     print(f"Dummy data script not found: {dummy_script_path}")
@@ -165,8 +203,18 @@ def run_master_setup():
     
     return True
 
-def main():
+def main(argv=None):
     """Main test runner"""
+    parser = argparse.ArgumentParser(description="Enhanced replication test runner")
+    parser.add_argument('--yes', action='store_true', help="Answer yes to every prompt")
+    parser.add_argument('--skip-setup', action='store_true', help="Skip the master database setup")
+    parser.add_argument('--skip-dummy', action='store_true', help="Skip inserting dummy data")
+    args = parser.parse_args(argv)
+    
+    # Avoid per-print encode fallbacks (and UnicodeEncodeError) on legacy Windows consoles
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8')
+    
     print("Enhanced SQL Server Replication Manager - Test Runner")
     print("=" * 60)
     
@@ -179,15 +227,22 @@ def main():
         sys.exit(1)
     
     # Test SQL connections
-    if not test_sql_connections():
+    connections = {}
+    if not test_sql_connections(connections):
         print("\n⚠️  SQL Server connection tests failed.")
         print("Please ensure the SQL Server instances are running and accessible.")
-        response = input("Do you want to continue anyway? (y/N): ")
-        if response.lower() != 'y':
-            sys.exit(1)
+        if not args.yes:
+            response = input("Do you want to continue anyway? (y/N): ")
+            if response.lower() != 'y':
+                sys.exit(1)
     
     # Offer master database setup
-    if not run_master_setup():
+    setup_ok = args.skip_setup or run_master_setup(
+        connections.get('Master'), assume_yes=args.yes, skip_dummy=args.skip_dummy
+    )
+    for conn in connections.values():
+        conn.close()
+    if not setup_ok:
         print("Master database setup failed.")
         sys.exit(1)
     
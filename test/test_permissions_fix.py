@@ -35,96 +35,61 @@ def test_permission_queries():
     
     print(f"Testing connection to: {master['host']}:{master['port']} as {master['username']}")
     
+    # Progressively simpler queries; the first one that returns a row wins
+    candidates = (
+        ("Main", "SELECT IS_SRVROLEMEMBER('sysadmin'), IS_MEMBER('db_owner'), SUSER_NAME()"),
+        ("Fallback", "SELECT IS_SRVROLEMEMBER('sysadmin'), SUSER_NAME()"),
+        ("Simplest", "SELECT IS_SRVROLEMEMBER('sysadmin')"),
+    )
+    
     try:
-        # Test 1: Main permission query
-        print("\n🧪 Test 1: Main permission query...")
-        with pyodbc.connect(conn_str, timeout=10) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    IS_SRVROLEMEMBER('sysadmin') as is_sysadmin,
-                    IS_MEMBER('db_owner') as is_db_owner,
-                    SUSER_NAME() as current_user
-            """)
-            result = cursor.fetchone()
-            
-            if result:
-                print(f"✅ Main query successful:")
-                print(f"   • Is sysadmin: {result[0] == 1}")
-                print(f"   • Is db_owner: {result[1] == 1}")
-                print(f"   • Current user: {result[2]}")
-                
-                # Determine permissions
-                has_permissions = result[0] == 1 or result[1] == 1
-                if result[0] == 1:
-                    role = "sysadmin"
-                elif result[1] == 1:
-                    role = "db_owner"
-                else:
-                    role = "insufficient"
-                    
-                print(f"   • Has permissions: {has_permissions}")
-                print(f"   • Role: {role}")
-                
-                return True
-            else:
-                print("❌ No result from main query")
-                
+        conn = pyodbc.connect(conn_str, timeout=10)
     except Exception as e:
-        print(f"❌ Main query failed: {e}")
+        print(f"❌ Connection failed: {e}")
+        return False
         
-        # Test 2: Fallback query
-        try:
-            print("\n🧪 Test 2: Fallback query...")
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT IS_SRVROLEMEMBER('sysadmin'), SUSER_NAME()")
+    with conn:
+        cursor = conn.cursor()
+        for number, (label, sql) in enumerate(candidates, 1):
+            print(f"\n🧪 Test {number}: {label} query...")
+            try:
+                cursor.execute(sql)
                 result = cursor.fetchone()
+            except pyodbc.Error as e:
+                print(f"❌ {label} query failed: {e}")
+                continue
+                
+            if not result:
+                print(f"❌ No result from {label.lower()} query")
+                continue
+                
+            is_sysadmin = result[0] == 1
+            is_db_owner = len(result) > 2 and result[1] == 1
+            if len(result) > 1:
+                current_user = result[-1]
+            else:
+                current_user = f"{master['username']} (from config)"
                 
-                if result:
-                    print(f"✅ Fallback query successful:")
-                    print(f"   • Is sysadmin: {result[0] == 1}")
-                    print(f"   • Current user: {result[1]}")
-                    
-                    is_sysadmin = result[0] == 1
-                    role = "sysadmin" if is_sysadmin else "insufficient"
-                    
-                    print(f"   • Has permissions: {is_sysadmin}")
-                    print(f"   • Role: {role}")
-                    
-                    return True
-                else:
-                    print("❌ No result from fallback query")
-                    
-        except Exception as e2:
-            print(f"❌ Fallback query also failed: {e2}")
+            print(f"✅ {label} query successful:")
+            print(f"   • Is sysadmin: {is_sysadmin}")
+            if len(result) > 2:
+                print(f"   • Is db_owner: {is_db_owner}")
+            print(f"   • Current user: {current_user}")
             
-            # Test 3: Simplest possible query
-            try:
-                print("\n🧪 Test 3: Simplest query...")
-                with pyodbc.connect(conn_str, timeout=10) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT IS_SRVROLEMEMBER('sysadmin')")
-                    result = cursor.fetchone()
-                    
-                    if result:
-                        print(f"✅ Simplest query successful:")
-                        print(f"   • Is sysadmin: {result[0] == 1}")
-                        print(f"   • Current user: {master['username']} (from config)")
-                        
-                        is_sysadmin = result[0] == 1
-                        role = "sysadmin" if is_sysadmin else "insufficient"
-                        
-                        print(f"   • Has permissions: {is_sysadmin}")
-                        print(f"   • Role: {role}")
-                        
-                        return True
-                    else:
-                        print("❌ No result from simplest query")
-                        
-            except Exception as e3:
-                print(f"❌ All queries failed. Final error: {e3}")
+            # Determine permissions
+            if is_sysadmin:
+                role = "sysadmin"
+            elif is_db_owner:
+                role = "db_owner"
+            else:
+                role = "insufficient"
                 
+            print(f"   • Has permissions: {is_sysadmin or is_db_owner}")
+            print(f"   • Role: {role}")
+            
+            return True
+            
+    print("❌ All queries failed")
     return False
 
 def main():
@@ -10,6 +10,11 @@ import sys
 import json
 import pyodbc
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def test_sql_syntax():
     """Test the SQL syntax for permission checking"""
     print("🔍 Testing SQL Syntax Fix...")
@@ -19,8 +24,12 @@ def test_sql_syntax():
         print("❌ Configuration file not found")
         return False
         
-    with open('replication_config_enhanced.json', 'r') as f:
-        config = json.load(f)
+    if orjson:
+        with open('replication_config_enhanced.json', 'rb') as f:
+            config = orjson.loads(f.read())
+    else:
+        with open('replication_config_enhanced.json', 'r') as f:
+            config = json.load(f)
         
     master = config['master_database']
     
@@ -13,343 +13,536 @@ This script validates all prerequisites before running the replication manager:
 import os
 import sys
 import json
+import threading
 import pyodbc
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Optional accelerators; the stdlib paths below are used when they are not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+# Line prefixes for each report level
+ICON = {
+    'section': "\n🔍 ",
+    'replica': "\n📍 ",
+    'ok': "✅ ",
+    'fail': "❌ ",
+    'warn': "⚠️  ",
+    'hint': "   👉 ",
+    'note': "   📝 ",
+    'info': "",
+}
+
+REQUIRED_SECTIONS = ['replication', 'master_database', 'replica_databases', 'schemas_to_replicate']
+
+_SCHEMA = {
+    'type': 'object',
+    'required': REQUIRED_SECTIONS,
+    'properties': {
+        'replication': {'type': 'object'},
+        'master_database': {'type': 'object', 'required': ['host', 'port', 'username', 'password', 'database']},
+        'replica_databases': {'type': 'array', 'items': {'type': 'object', 'required': ['name', 'host', 'port', 'username', 'password']}},
+        'schemas_to_replicate': {'type': 'array', 'items': {'type': 'object', 'required': ['schema_name', 'tables']}},
+    },
+}
+
+_VALIDATOR = fastjsonschema.compile(_SCHEMA) if fastjsonschema else None
+
+# Query text used by the check_* methods, built once at import time
+_SQL_DB_EXISTS = "SELECT name FROM sys.databases WHERE name = ?"
+
+_SQL_TABLE_EXISTS = """
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
+    WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+"""
+
+_SQL_PK_CHECK = """
+    SELECT TOP (1) 1
+    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS t
+    JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
+      ON t.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+    WHERE t.CONSTRAINT_TYPE = 'PRIMARY KEY'
+      AND k.TABLE_SCHEMA = ? AND k.TABLE_NAME = ?
+"""
+
+# {values} is filled with one "(?, ?)" row per (schema, table) pair
+_SQL_TABLES_STATUS = """
+    SELECT s.schema_name, s.table_name,
+           CASE WHEN t.TABLE_NAME IS NULL THEN 0 ELSE 1 END AS exists_flag,
+           CASE WHEN EXISTS (
+               SELECT 1 FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+               WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+                 AND tc.TABLE_SCHEMA = s.schema_name AND tc.TABLE_NAME = s.table_name
+           ) THEN 1 ELSE 0 END AS has_pk
+    FROM (VALUES {values}) AS s(schema_name, table_name)
+    LEFT JOIN INFORMATION_SCHEMA.TABLES t
+      ON t.TABLE_SCHEMA = s.schema_name AND t.TABLE_NAME = s.table_name
+"""
+
+_SQL_AGENT_STATUS = """
+    SELECT dss.[status], dss.[status_desc]
+    FROM sys.dm_server_services dss
+    WHERE dss.[servicename] LIKE N'SQL Server Agent%'
+"""
+
+_SQL_PERMS = "SELECT IS_SRVROLEMEMBER('sysadmin'), IS_MEMBER('db_owner'), SUSER_NAME()"
+
+_SQL_PERMS_FALLBACK = "SELECT IS_SRVROLEMEMBER('sysadmin'), SUSER_NAME()"
+
+# Permissions, database existence and agent status in a single batch
+_SQL_MASTER_CHECKS = ";\n".join([_SQL_PERMS, _SQL_DB_EXISTS, _SQL_AGENT_STATUS]) + ";"
+
 class PrerequisitesValidator:
+    # (summary label, validation method) in the order the phases run
+    _PHASES = (
+        ("Configuration", 'validate_configuration'),
+        ("Master Database", 'validate_master_database'),
+        ("Replica Databases", 'validate_replica_databases'),
+        ("Network Connectivity", 'validate_network_connectivity'),
+    )
+    
     def __init__(self, config_file='replication_config_enhanced.json'):
         self.config_file = config_file
         self.config = self.load_config()
         self.validation_results = {}
+        self._conn_cache = {}
+        self._conn_lock = threading.Lock()
+        self._conn_probe_cache = {}
+        self._server_info_cache = {}
+        self._log = []
         
     def load_config(self):
         """Load configuration file"""
         try:
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
+            if orjson:
+                with open(self.config_file, 'rb') as f:
+                    config = orjson.loads(f.read())
+            else:
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
         except FileNotFoundError:
             print(f"❌ Configuration file not found: {self.config_file}")
             sys.exit(1)
         except json.JSONDecodeError as e:
             print(f"❌ Invalid JSON in configuration: {e}")
             sys.exit(1)
+        return config
+            
+    def _emit(self, level, msg):
+        """Buffer a report line; written out by _flush_log at the end of each phase"""
+        self._log.append((level, msg))
+        
+    def _flush_log(self):
+        """Write all buffered report lines in a single stdout call"""
+        if self._log:
+            sys.stdout.write("\n".join(ICON[level] + msg for level, msg in self._log) + "\n")
+            self._log.clear()
             
     def get_connection_string(self, db_config, database=None):
         """Generate connection string"""
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={db_config['host']},{db_config['port']};"
-            f"UID={db_config['username']};"
-            f"PWD={db_config['password']};"
-            f"TrustServerCertificate=yes;"
-        )
-        if database:
-            conn_str += f"DATABASE={database};"
-        return conn_str
+        # The database-independent part is built on first use (after validation) and kept on the config
+        base = db_config.get('_base_conn_str')
+        if base is None:
+            base = db_config['_base_conn_str'] = (
+                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+                f"SERVER={db_config['host']},{db_config['port']};"
+                f"UID={db_config['username']};"
+                f"PWD={db_config['password']};"
+                f"TrustServerCertificate=yes;"
+                f"LoginTimeout=5;ConnectRetryCount=0;"
+            )
+        return base + (f"DATABASE={database};" if database else "")
+        
+    def get_connection(self, db_config, database=None):
+        """Get a cached connection for (host, port, database), opening it on first use"""
+        # Keyed per thread as well: pyodbc connections must not be shared across threads
+        key = (threading.get_ident(), db_config['host'], db_config['port'], database)
+        conn = self._conn_cache.get(key)
+        if conn is None:
+            conn_str = self.get_connection_string(db_config, database)
+            conn = pyodbc.connect(conn_str, timeout=5, autocommit=True)
+            with self._conn_lock:
+                self._conn_cache[key] = conn
+        return conn
+        
+    def close_connections(self):
+        """Close all cached connections"""
+        with self._conn_lock:
+            conns = list(self._conn_cache.values())
+            self._conn_cache.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        
+    def _liveness(self, db_config, database=None):
+        """Cheap SELECT 1 reachability check (result cached per host, port, user and database)"""
+        key = (db_config['host'], db_config['port'], db_config['username'], database)
+        if key in self._conn_probe_cache:
+            return self._conn_probe_cache[key]
+            
+        try:
+            cursor = self.get_connection(db_config, database).cursor()
+            cursor.execute("SELECT 1")
+            alive = cursor.fetchone() is not None
+        except Exception:
+            alive = False
+            
+        self._conn_probe_cache[key] = alive
+        return alive
         
     def test_connection(self, db_config, database=None):
-        """Test database connection"""
+        """Test database connection and describe the server (queried once per host)"""
+        key = (db_config['host'], db_config['port'], db_config['username'], database)
+        if key in self._server_info_cache:
+            return self._server_info_cache[key]
+            
         try:
-            conn_str = self.get_connection_string(db_config, database)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT @@SERVERNAME, @@VERSION")
-                result = cursor.fetchone()
-                return True, result[0], result[1]
+            cursor = self.get_connection(db_config, database).cursor()
+            cursor.execute("SELECT @@SERVERNAME, @@VERSION")
+            result = cursor.fetchone()
+            probe = (True, result[0], result[1])
         except Exception as e:
-            return False, None, str(e)
+            probe = (False, None, str(e))
             
-    def check_database_exists(self, db_config, database_name):
+        # A successful (or failed) describe also answers later liveness checks
+        self._conn_probe_cache[key] = probe[0]
+        self._server_info_cache[key] = probe
+        return probe
+            
+    def check_database_exists(self, cursor, database_name):
         """Check if database exists"""
         try:
-            conn_str = self.get_connection_string(db_config)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sys.databases WHERE name = ?", database_name)
-                return cursor.fetchone() is not None
+            cursor.execute(_SQL_DB_EXISTS, database_name)
+            return cursor.fetchone() is not None
         except Exception:
             return False
             
-    def check_table_exists(self, db_config, database_name, schema, table):
+    def check_table_exists(self, cursor, schema, table):
         """Check if table exists"""
         try:
-            conn_str = self.get_connection_string(db_config, database_name)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                    WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
-                """, schema, table)
-                return cursor.fetchone()[0] > 0
+            cursor.execute(_SQL_TABLE_EXISTS, schema, table)
+            return cursor.fetchone()[0] > 0
         except Exception:
             return False
             
-    def check_primary_key(self, db_config, database_name, schema, table):
+    def check_primary_key(self, cursor, schema, table):
         """Check if table has primary key"""
         try:
-            conn_str = self.get_connection_string(db_config, database_name)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT k.COLUMN_NAME
-                    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS t
-                    JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
-                      ON t.CONSTRAINT_NAME = k.CONSTRAINT_NAME
-                    WHERE t.CONSTRAINT_TYPE = 'PRIMARY KEY'
-                      AND k.TABLE_SCHEMA = ? AND k.TABLE_NAME = ?
-                """, schema, table)
-                return len(cursor.fetchall()) > 0
+            cursor.execute(_SQL_PK_CHECK, schema, table)
+            return cursor.fetchone() is not None
         except Exception:
             return False
             
-    def check_sql_agent_status(self, db_config):
+    def check_tables(self, cursor, tables):
+        """Check existence and primary key for many (schema, table) pairs at once"""
+        status = {}
+        cursor.arraysize = 500
+        # Stay well below SQL Server's 2100 parameter limit (two per pair)
+        for start in range(0, len(tables), 1000):
+            chunk = tables[start:start + 1000]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            cursor.execute(_SQL_TABLES_STATUS.format(values=values),
+                           [name for pair in chunk for name in pair])
+            for schema, table, exists_flag, has_pk in cursor.fetchall():
+                status[(schema, table)] = (exists_flag == 1, has_pk == 1)
+        return status
+        
+    def check_sql_agent_status(self, cursor):
         """Check if SQL Server Agent is running"""
         try:
-            conn_str = self.get_connection_string(db_config)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                # Try to check agent status
-                cursor.execute("""
-                    SELECT dss.[status], dss.[status_desc]
-                    FROM sys.dm_server_services dss
-                    WHERE dss.[servicename] LIKE N'SQL Server Agent%'
-                """)
-                result = cursor.fetchone()
-                if result:
-                    return result[0] == 4, result[1]  # 4 = Running
-                else:
-                    return False, "SQL Server Agent service not found"
+            # Try to check agent status
+            cursor.execute(_SQL_AGENT_STATUS)
+            result = cursor.fetchone()
+            if result:
+                return result[0] == 4, result[1]  # 4 = Running
+            else:
+                return False, "SQL Server Agent service not found"
         except Exception as e:
             return False, str(e)
             
-    def check_permissions(self, db_config, database_name):
+    def check_permissions(self, cursor, username='Unknown'):
         """Check user permissions"""
         try:
-            conn_str = self.get_connection_string(db_config, database_name)
-            with pyodbc.connect(conn_str, timeout=10) as conn:
-                cursor = conn.cursor()
-                
-                # Check if user is sysadmin or db_owner using simplified query
-                cursor.execute("""
-                    SELECT 
-                        IS_SRVROLEMEMBER('sysadmin') as is_sysadmin,
-                        IS_MEMBER('db_owner') as is_db_owner,
-                        SUSER_NAME() as current_user
-                """)
-                result = cursor.fetchone()
-                
-                if not result:
-                    return False, "Unknown", "Unable to check permissions"
-                
-                has_permissions = result[0] == 1 or result[1] == 1
-                current_user = result[2] if result[2] else db_config.get('username', 'Unknown')
-                
-                if result[0] == 1:
-                    role = "sysadmin"
-                elif result[1] == 1:
-                    role = "db_owner"
-                else:
-                    role = "insufficient"
-                    
-                return has_permissions, current_user, role
-                
+            # Check if user is sysadmin or db_owner using simplified query
+            cursor.execute(_SQL_PERMS)
+            return self._permissions_from_row(cursor.fetchone(), username)
+            
         except Exception as e:
             # If the main query fails, try a simpler approach
             try:
-                conn_str = self.get_connection_string(db_config, 'master')
-                with pyodbc.connect(conn_str, timeout=10) as conn:
-                    cursor = conn.cursor()
+                # Check only sysadmin role
+                cursor.execute(_SQL_PERMS_FALLBACK)
+                result = cursor.fetchone()
+                
+                if result:
+                    is_sysadmin = result[0] == 1
+                    current_user = result[1] if result[1] else username
                     
-                    # Check only sysadmin role on master database
-                    cursor.execute("SELECT IS_SRVROLEMEMBER('sysadmin'), SUSER_NAME()")
-                    result = cursor.fetchone()
+                    role = "sysadmin" if is_sysadmin else "insufficient"
+                    return is_sysadmin, current_user, role
+                else:
+                    return False, username, "Unable to check permissions"
                     
-                    if result:
-                        is_sysadmin = result[0] == 1
-                        current_user = result[1] if result[1] else db_config.get('username', 'Unknown')
-                        
-                        role = "sysadmin" if is_sysadmin else "insufficient"
-                        return is_sysadmin, current_user, role
-                    else:
-                        return False, db_config.get('username', 'Unknown'), "Unable to check permissions"
-                        
             except Exception as e2:
                 # Final fallback - assume user from config
-                username = db_config.get('username', 'Unknown')
                 error_msg = str(e2) if len(str(e2)) < 100 else str(e2)[:100] + "..."
                 return False, username, f"Permission check failed: {error_msg}"
             
+    def _permissions_from_row(self, result, username):
+        """Interpret an (is_sysadmin, is_db_owner, user) row as (has_permissions, user, role)"""
+        if not result:
+            return False, "Unknown", "Unable to check permissions"
+        
+        has_permissions = result[0] == 1 or result[1] == 1
+        current_user = result[2] if result[2] else username
+        
+        if result[0] == 1:
+            role = "sysadmin"
+        elif result[1] == 1:
+            role = "db_owner"
+        else:
+            role = "insufficient"
+            
+        return has_permissions, current_user, role
+        
+    def check_master_server(self, cursor, database_name, username='Unknown'):
+        """Run the permissions, database and agent checks as one batch (one round trip)"""
+        try:
+            cursor.execute(_SQL_MASTER_CHECKS, database_name)
+            perms_row = cursor.fetchone()
+            cursor.nextset()
+            db_exists = cursor.fetchone() is not None
+            cursor.nextset()
+            agent_row = cursor.fetchone()
+        except Exception:
+            # Fall back to the individual checks, which carry their own fallbacks
+            return (
+                self.check_permissions(cursor, username),
+                self.check_database_exists(cursor, database_name),
+                self.check_sql_agent_status(cursor),
+            )
+            
+        if agent_row:
+            agent = (agent_row[0] == 4, agent_row[1])  # 4 = Running
+        else:
+            agent = (False, "SQL Server Agent service not found")
+        return self._permissions_from_row(perms_row, username), db_exists, agent
+        
     def validate_master_database(self):
         """Validate master database prerequisites"""
-        print("\n🔍 Validating Master Database Prerequisites...")
+        self._emit('section', "Validating Master Database Prerequisites...")
         
         master = self.config['master_database']
         
         # Test connection
         success, server_name, version = self.test_connection(master)
         if not success:
-            print(f"❌ Cannot connect to master database: {version}")
-            print("   👉 Check connection details in replication_config_enhanced.json")
-            print("   👉 Verify network connectivity and firewall settings")
+            self._emit('fail', f"Cannot connect to master database: {version}")
+            self._emit('hint', "Check connection details in replication_config_enhanced.json")
+            self._emit('hint', "Verify network connectivity and firewall settings")
             return False
             
-        print(f"✅ Master connection successful: {server_name}")
-        print(f"   Version: {version[:80]}...")
+        self._emit('ok', f"Master connection successful: {server_name}")
+        self._emit('info', f"   Version: {version[:80]}...")
+        
+        # Server-level checks share the connection opened by test_connection
+        cursor = self.get_connection(master).cursor()
+        
+        # Permissions, database existence and agent status in a single batch
+        perms, db_exists, (agent_running, agent_status) = self.check_master_server(
+            cursor, master['database'], master.get('username', 'Unknown'))
         
         # Check permissions first (using master database)
-        has_perms, username, role = self.check_permissions(master, 'master')
+        has_perms, username, role = perms
         if not has_perms:
-            print(f"❌ Insufficient permissions for user '{username}': {role}")
-            print("   👉 User needs 'sysadmin' server role or 'db_owner' database role")
-            print("   👉 Grant permissions with: EXEC sp_addsrvrolemember 'username', 'sysadmin'")
+            self._emit('fail', f"Insufficient permissions for user '{username}': {role}")
+            self._emit('hint', "User needs 'sysadmin' server role or 'db_owner' database role")
+            self._emit('hint', "Grant permissions with: EXEC sp_addsrvrolemember 'username', 'sysadmin'")
             return False
             
-        print(f"✅ User '{username}' has sufficient permissions: {role}")
+        self._emit('ok', f"User '{username}' has sufficient permissions: {role}")
         
         # Check if database exists
-        db_exists = self.check_database_exists(master, master['database'])
         if not db_exists:
-            print(f"❌ Database '{master['database']}' does not exist")
-            print(f"   👉 Run setup_master_prerequisites.sql first!")
-            print(f"   👉 Or create database manually: CREATE DATABASE [{master['database']}]")
+            self._emit('fail', f"Database '{master['database']}' does not exist")
+            self._emit('hint', f"Run setup_master_prerequisites.sql first!")
+            self._emit('hint', f"Or create database manually: CREATE DATABASE [{master['database']}]")
             return False
             
-        print(f"✅ Database '{master['database']}' exists")
+        self._emit('ok', f"Database '{master['database']}' exists")
         
         # Check SQL Server Agent
-        agent_running, agent_status = self.check_sql_agent_status(master)
         if not agent_running:
-            print(f"⚠️  SQL Server Agent not running: {agent_status}")
-            print("   👉 Please start SQL Server Agent service")
-            print("   👉 Use SQL Server Configuration Manager or run: NET START SQLSERVERAGENT")
+            self._emit('warn', f"SQL Server Agent not running: {agent_status}")
+            self._emit('hint', "Please start SQL Server Agent service")
+            self._emit('hint', "Use SQL Server Configuration Manager or run: NET START SQLSERVERAGENT")
         else:
-            print(f"✅ SQL Server Agent is running: {agent_status}")
+            self._emit('ok', f"SQL Server Agent is running: {agent_status}")
             
         # Check required tables
         schemas = self.config['schemas_to_replicate']
         missing_tables = []
+        db_cursor = self.get_connection(master, master['database']).cursor()
+        
+        # Existence and primary key for every configured table in one round-trip
+        table_status = self.check_tables(db_cursor, [
+            (schema['schema_name'], table_config['table_name'])
+            for schema in schemas
+            for table_config in schema['tables']
+        ])
         
         for schema in schemas:
             for table_config in schema['tables']:
                 table_name = table_config['table_name']
+                exists, has_pk = table_status.get((schema['schema_name'], table_name), (False, False))
                 
-                if not self.check_table_exists(master, master['database'], schema['schema_name'], table_name):
+                if not exists:
                     missing_tables.append(f"{schema['schema_name']}.{table_name}")
                     continue
                     
                 # Check primary key
-                if not self.check_primary_key(master, master['database'], schema['schema_name'], table_name):
-                    print(f"❌ Table {schema['schema_name']}.{table_name} missing primary key")
-                    print("   👉 Transactional replication requires primary keys on all tables")
+                if not has_pk:
+                    self._emit('fail', f"Table {schema['schema_name']}.{table_name} missing primary key")
+                    self._emit('hint', "Transactional replication requires primary keys on all tables")
                     return False
                     
-                print(f"✅ Table {schema['schema_name']}.{table_name} exists with primary key")
+                self._emit('ok', f"Table {schema['schema_name']}.{table_name} exists with primary key")
                 
         if missing_tables:
-            print(f"❌ Missing tables: {', '.join(missing_tables)}")
-            print("   👉 Run setup_master_prerequisites.sql to create tables")
-            print("   👉 Or create tables manually based on your schema requirements")
+            self._emit('fail', f"Missing tables: {', '.join(missing_tables)}")
+            self._emit('hint', "Run setup_master_prerequisites.sql to create tables")
+            self._emit('hint', "Or create tables manually based on your schema requirements")
             return False
             
         return True
         
-    def validate_replica_databases(self):
-        """Validate replica database prerequisites"""
-        print("\n🔍 Validating Replica Database Prerequisites...")
+    def _validate_one_replica(self, replica):
+        """Validate a single replica, returning (name, ok, messages) for ordered printing"""
+        messages = [('replica', f"Checking replica: {replica['name']}")]
         
-        replicas = self.config['replica_databases']
-        all_valid = True
+        # Test connection
+        success, server_name, version = self.test_connection(replica)
+        if not success:
+            messages.append(('fail', f"Cannot connect to replica {replica['name']}: {version}"))
+            messages.append(('hint', "Check connection details in replication_config_enhanced.json"))
+            messages.append(('hint', "Verify network connectivity and firewall settings"))
+            return replica['name'], False, messages
+            
+        messages.append(('ok', f"Replica connection successful: {server_name}"))
+        cursor = self.get_connection(replica).cursor()
         
-        for replica in replicas:
-            print(f"\n📍 Checking replica: {replica['name']}")
+        # Check permissions (using master database for server-level permissions)
+        has_perms, username, role = self.check_permissions(cursor, replica.get('username', 'Unknown'))
+        if not has_perms:
+            messages.append(('fail', f"Insufficient permissions for user '{username}': {role}"))
+            messages.append(('hint', "User needs 'sysadmin' server role for replication setup"))
+            messages.append(('hint', "Grant permissions with: EXEC sp_addsrvrolemember 'username', 'sysadmin'"))
+            return replica['name'], False, messages
             
-            # Test connection
-            success, server_name, version = self.test_connection(replica)
-            if not success:
-                print(f"❌ Cannot connect to replica {replica['name']}: {version}")
-                print("   👉 Check connection details in replication_config_enhanced.json")
-                print("   👉 Verify network connectivity and firewall settings")
-                all_valid = False
-                continue
-                
-            print(f"✅ Replica connection successful: {server_name}")
+        messages.append(('ok', f"User '{username}' has sufficient permissions: {role}"))
+        
+        # Check SQL Server Agent
+        agent_running, agent_status = self.check_sql_agent_status(cursor)
+        if not agent_running:
+            messages.append(('warn', f"SQL Server Agent not running: {agent_status}"))
+            messages.append(('hint', "Please start SQL Server Agent service"))
+            messages.append(('hint', "Use SQL Server Configuration Manager or run: NET START SQLSERVERAGENT"))
+        else:
+            messages.append(('ok', f"SQL Server Agent is running: {agent_status}"))
             
-            # Check permissions (using master database for server-level permissions)
-            has_perms, username, role = self.check_permissions(replica, 'master')
-            if not has_perms:
-                print(f"❌ Insufficient permissions for user '{username}': {role}")
-                print("   👉 User needs 'sysadmin' server role for replication setup")
-                print("   👉 Grant permissions with: EXEC sp_addsrvrolemember 'username', 'sysadmin'")
-                all_valid = False
-                continue
-                
-            print(f"✅ User '{username}' has sufficient permissions: {role}")
+        # Note: Replica databases will be created automatically by the script
+        messages.append(('note', f"Note: Replica database will be created automatically"))
+        return replica['name'], True, messages
+        
+    def validate_replica_databases(self):
+        """Validate replica database prerequisites"""
+        self._emit('section', "Validating Replica Database Prerequisites...")
+        
+        replicas = self.config['replica_databases']
+        if not replicas:
+            return True
             
-            # Check SQL Server Agent
-            agent_running, agent_status = self.check_sql_agent_status(replica)
-            if not agent_running:
-                print(f"⚠️  SQL Server Agent not running: {agent_status}")
-                print("   👉 Please start SQL Server Agent service")
-                print("   👉 Use SQL Server Configuration Manager or run: NET START SQLSERVERAGENT")
-            else:
-                print(f"✅ SQL Server Agent is running: {agent_status}")
+        # Replicas are independent, so overlap their network waits
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(16, len(replicas))) as executor:
+            futures = [executor.submit(self._validate_one_replica, replica) for replica in replicas]
+            for future in as_completed(futures):
+                name, ok, messages = future.result()
+                results[name] = (ok, messages)
                 
-            # Note: Replica databases will be created automatically by the script
-            print(f"   📝 Note: Replica database will be created automatically")
+        all_valid = True
+        for replica in replicas:
+            ok, messages = results[replica['name']]
+            self._log.extend(messages)
+            all_valid = all_valid and ok
             
         return all_valid
         
     def validate_network_connectivity(self):
         """Validate network connectivity between master and replicas"""
-        print("\n🔍 Validating Network Connectivity...")
+        self._emit('section', "Validating Network Connectivity...")
         
         master = self.config['master_database']
         replicas = self.config['replica_databases']
         
-        # Test master to replica connectivity
-        for replica in replicas:
-            try:
-                # This is a simplified connectivity test
-                # In production, you might want to test actual network ports
-                master_conn = self.test_connection(master)[0]
-                replica_conn = self.test_connection(replica)[0]
-                
-                if master_conn and replica_conn:
-                    print(f"✅ Network connectivity: Master ↔ {replica['name']}")
-                else:
-                    print(f"❌ Network connectivity issue: Master ↔ {replica['name']}")
-                    return False
-                    
-            except Exception as e:
-                print(f"❌ Network test failed for {replica['name']}: {e}")
+        # Probe the master once and every replica concurrently
+        # This is a simplified connectivity test
+        # In production, you might want to test actual network ports
+        targets = [master] + replicas
+        with ThreadPoolExecutor(max_workers=min(16, len(targets))) as executor:
+            probes = list(executor.map(self._liveness, targets))
+            
+        master_conn = probes[0]
+        for replica, replica_conn in zip(replicas, probes[1:]):
+            if master_conn and replica_conn:
+                self._emit('ok', f"Network connectivity: Master ↔ {replica['name']}")
+            else:
+                self._emit('fail', f"Network connectivity issue: Master ↔ {replica['name']}")
                 return False
                 
         return True
         
     def validate_configuration(self):
         """Validate configuration file"""
-        print("\n🔍 Validating Configuration...")
+        self._emit('section', "Validating Configuration...")
         
-        required_sections = ['replication', 'master_database', 'replica_databases', 'schemas_to_replicate']
-        
-        for section in required_sections:
-            if section not in self.config:
-                print(f"❌ Missing configuration section: {section}")
+        if _VALIDATOR:
+            try:
+                _VALIDATOR(self.config)
+            except fastjsonschema.JsonSchemaException as e:
+                self._emit('fail', f"Invalid configuration: {e.message}")
                 return False
-            print(f"✅ Configuration section '{section}' found")
+        else:
+            for section in REQUIRED_SECTIONS:
+                if section not in self.config:
+                    self._emit('fail', f"Missing configuration section: {section}")
+                    return False
+                    
+        for section in REQUIRED_SECTIONS:
+            self._emit('ok', f"Configuration section '{section}' found")
             
         # Validate replication settings
         replication = self.config['replication']
         if not replication.get('enabled', True):
-            print("⚠️  Replication is disabled in configuration")
+            self._emit('warn', "Replication is disabled in configuration")
             
         sync_interval = replication.get('sync_interval_seconds', 15)
         if sync_interval < 5:
-            print(f"⚠️  Very short sync interval: {sync_interval}s (may cause performance issues)")
+            self._emit('warn', f"Very short sync interval: {sync_interval}s (may cause performance issues)")
         elif sync_interval > 300:
-            print(f"⚠️  Long sync interval: {sync_interval}s (may cause data delays)")
+            self._emit('warn', f"Long sync interval: {sync_interval}s (may cause data delays)")
         else:
-            print(f"✅ Sync interval: {sync_interval}s")
+            self._emit('ok', f"Sync interval: {sync_interval}s")
             
         return True
         
@@ -359,25 +552,20 @@ class PrerequisitesValidator:
         print("=" * 60)
         print(f"Started at: {datetime.now()}")
         
-        validations = [
-            ("Configuration", self.validate_configuration),
-            ("Master Database", self.validate_master_database),
-            ("Replica Databases", self.validate_replica_databases),
-            ("Network Connectivity", self.validate_network_connectivity),
-        ]
-        
-        all_passed = True
+        # Every phase starts as failed so an aborted run still yields a complete summary
+        self.validation_results = dict.fromkeys((name for name, _ in self._PHASES), False)
         
-        for name, validation_func in validations:
-            try:
-                result = validation_func()
-                self.validation_results[name] = result
-                if not result:
-                    all_passed = False
-            except Exception as e:
-                print(f"❌ {name} validation failed with error: {e}")
-                self.validation_results[name] = False
-                all_passed = False
+        try:
+            for name, method in self._PHASES:
+                try:
+                    self.validation_results[name] = getattr(self, method)()
+                except Exception as e:
+                    self._emit('fail', f"{name} validation failed with error: {e}")
+                self._flush_log()
+        finally:
+            self.close_connections()
+            
+        all_passed = all(self.validation_results.values())
                 
         # Summary
         print("\n" + "=" * 60)
@@ -1,27 +1,97 @@
+import argparse
 import pyodbc
 import json
 import logging
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Configuration Loading ---
 def load_config(config_path='replication_config_enhanced.json'):
     """Loads the replication configuration from a JSON file."""
+    if orjson:
+        with open(config_path, 'rb') as f:
+            return orjson.loads(f.read())
     with open(config_path, 'r') as f:
         return json.load(f)
 
 # --- Database Connection and Querying ---
-def get_row_count(conn_str, db_name, schema, table):
-    """Connects to a database and gets the row count of a specific table."""
-    full_conn_str = f"{conn_str};DATABASE={db_name}"
-    conn = None
-    cursor = None
+def build_conn_str(db_config, readonly_intent=False):
+    """Builds the full connection string (including DATABASE) for a master or replica config."""
+    conn_str = (
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+        f"SERVER={db_config['host']},{db_config['port']};"
+        f"UID={db_config['username']};"
+        f"PWD={db_config['password']};"
+        f"TrustServerCertificate=yes;"
+        f"DATABASE={db_config['database']}"
+    )
+    if readonly_intent:
+        # Lets an Always On availability group listener route the session to a readable secondary
+        conn_str += ";ApplicationIntent=ReadOnly;MultiSubnetFailover=yes"
+    return conn_str
+
+# Open (connection, cursor) pairs, one per server/database, reused for the whole verification run
+_connections = {}
+_connection_locks = {}
+_connections_lock = threading.Lock()
+
+def connection_lock(full_conn_str):
+    """Returns the lock that serializes use of one cached connection."""
+    with _connections_lock:
+        return _connection_locks.setdefault(full_conn_str, threading.Lock())
+
+def get_cursor(full_conn_str, timeout=30):
+    """Returns the cached cursor for a connection string; callers must hold its connection_lock."""
+    entry = _connections.get(full_conn_str)
+    if entry is None:
+        # autocommit so no transaction is left open between the reused cursor's queries
+        conn = pyodbc.connect(full_conn_str, autocommit=True)
+        conn.timeout = timeout
+        entry = (conn, conn.cursor())
+        with _connections_lock:
+            _connections[full_conn_str] = entry
+    return entry[1]
+
+def _close_entry(entry):
+    """Closes a cached cursor and its connection."""
+    conn, cursor = entry
+    for handle in (cursor, conn):
+        try:
+            handle.close()
+        except pyodbc.Error:
+            pass
+
+def discard_connection(full_conn_str):
+    """Drops a cached connection (e.g. after a transport error) so the next call reconnects."""
+    with _connections_lock:
+        entry = _connections.pop(full_conn_str, None)
+    if entry:
+        _close_entry(entry)
+
+def close_all():
+    """Closes every cached cursor and connection."""
+    with _connections_lock:
+        entries = list(_connections.values())
+        _connections.clear()
+    for entry in entries:
+        _close_entry(entry)
+
+def get_row_count(full_conn_str, schema, table, timeout=30, db_name='database'):
+    """Gets the row count of a specific table over a cached connection."""
     try:
-        conn = pyodbc.connect(full_conn_str)
-        cursor = conn.cursor()
-        # Use NOLOCK hint to avoid blocking on replicas
-        query = f"SELECT COUNT(*) FROM [{schema}].[{table}] WITH (NOLOCK);"
-        cursor.execute(query)
-        count = cursor.fetchone()[0]
+        # A connection must not be used by two threads at once
+        with connection_lock(full_conn_str):
+            cursor = get_cursor(full_conn_str, timeout)
+            # Use NOLOCK hint to avoid blocking on replicas
+            query = f"SELECT COUNT_BIG(*) FROM [{schema}].[{table}] WITH (NOLOCK);"
+            cursor.execute(query)
+            count = cursor.fetchval()
         return count
     except pyodbc.ProgrammingError as ex:
         # This can happen if the table doesn't exist yet on the replica
@@ -29,69 +99,234 @@ def get_row_count(conn_str, db_name, schema, table):
         return 0
     except pyodbc.Error as ex:
         logging.error(f"Database error while getting row count for {schema}.{table}: {ex}")
+        discard_connection(full_conn_str)
         return -1 # Indicate an error
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+def _nstring(value):
+    """Quotes a name as a T-SQL N'' string literal."""
+    return "N'" + value.replace("'", "''") + "'"
+
+def get_all_row_counts(full_conn_str, tables, timeout=30, db_name='database'):
+    """Gets the row counts of many tables in one round-trip, keyed by (schema, table)."""
+    counts = {}
+    # One row per table via UNION ALL (no select-list column limit); chunked to keep statements small
+    for start in range(0, len(tables), 1000):
+        chunk = tables[start:start + 1000]
+        query = "\nUNION ALL\n".join(
+            f"SELECT {_nstring(schema)} AS s, {_nstring(table)} AS t, "
+            f"COUNT_BIG(*) AS c FROM [{schema}].[{table}] WITH (NOLOCK)"
+            for schema, table in chunk
+        ) + ";"
+        try:
+            with connection_lock(full_conn_str):
+                cursor = get_cursor(full_conn_str, timeout)
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            counts.update({(row.s, row.t): row.c for row in rows})
+        except pyodbc.ProgrammingError:
+            # Usually a table missing on a replica that hasn't been snapshotted yet;
+            # count this chunk one table at a time so the others are still reported
+            for schema, table in chunk:
+                counts[(schema, table)] = get_row_count(full_conn_str, schema, table, timeout, db_name)
+        except pyodbc.Error as ex:
+            logging.error(f"Database error while getting row counts on {db_name}: {ex}")
+            discard_connection(full_conn_str)
+            counts.update(dict.fromkeys(chunk, -1))
+    return counts
+
+def get_all_row_counts_fast(full_conn_str, tables, timeout=30, db_name='database'):
+    """Gets row counts from sys.dm_db_partition_stats metadata without scanning any table data."""
+    try:
+        with connection_lock(full_conn_str):
+            cursor = get_cursor(full_conn_str, timeout)
+            cursor.execute("""
+                SELECT s.name, t.name, SUM(ps.row_count)
+                FROM sys.dm_db_partition_stats ps
+                JOIN sys.tables t ON t.object_id = ps.object_id
+                JOIN sys.schemas s ON s.schema_id = t.schema_id
+                WHERE ps.index_id IN (0, 1)
+                GROUP BY s.name, t.name;
+            """)
+            stats = {(schema, table): count for schema, table, count in cursor.fetchall()}
+    except pyodbc.Error as ex:
+        # e.g. missing VIEW DATABASE STATE permission; fall back to exact counts
+        logging.warning(f"Could not read partition stats on {db_name}, using exact counts instead. Error: {ex}")
+        return get_all_row_counts(full_conn_str, tables, timeout, db_name)
+
+    counts = {}
+    for schema, table in tables:
+        if (schema, table) not in stats:
+            # This can happen if the table doesn't exist yet on the replica
+            logging.warning(f"Table [{schema}].[{table}] not found on {db_name}. It might not have been created yet.")
+        counts[(schema, table)] = stats.get((schema, table), 0)
+    return counts
+
+def get_checksum(full_conn_str, schema, table, timeout=30, db_name='database'):
+    """Gets an order-independent checksum of a table's contents (None if it can't be computed)."""
+    try:
+        with connection_lock(full_conn_str):
+            cursor = get_cursor(full_conn_str, timeout)
+            cursor.execute(f"SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM [{schema}].[{table}] WITH (NOLOCK);")
+            return cursor.fetchval()
+    except pyodbc.ProgrammingError as ex:
+        logging.warning(f"Could not checksum table [{schema}].[{table}] on {db_name}. It might not have been created yet. Error: {ex}")
+        return None
+    except pyodbc.Error as ex:
+        logging.error(f"Database error while getting checksum for {schema}.{table}: {ex}")
+        discard_connection(full_conn_str)
+        return None
+
+def get_all_checksums(full_conn_str, tables, timeout=30, db_name='database'):
+    """Gets the checksums of many tables in one round-trip, keyed by (schema, table)."""
+    checksums = {}
+    for start in range(0, len(tables), 1000):
+        chunk = tables[start:start + 1000]
+        query = "\nUNION ALL\n".join(
+            f"SELECT {_nstring(schema)} AS s, {_nstring(table)} AS t, "
+            f"CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS c FROM [{schema}].[{table}] WITH (NOLOCK)"
+            for schema, table in chunk
+        ) + ";"
+        try:
+            with connection_lock(full_conn_str):
+                cursor = get_cursor(full_conn_str, timeout)
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            checksums.update({(row.s, row.t): row.c for row in rows})
+        except pyodbc.ProgrammingError:
+            for schema, table in chunk:
+                checksums[(schema, table)] = get_checksum(full_conn_str, schema, table, timeout, db_name)
+        except pyodbc.Error as ex:
+            logging.error(f"Database error while getting checksums on {db_name}: {ex}")
+            discard_connection(full_conn_str)
+            checksums.update(dict.fromkeys(chunk, None))
+    return checksums
+
+def get_undelivered_commands(full_conn_str, timeout=30):
+    """Returns how many replicated commands the distributor has not yet delivered to subscribers."""
+    with connection_lock(full_conn_str):
+        cursor = get_cursor(full_conn_str, timeout)
+        cursor.execute("SELECT COALESCE(SUM(UndelivCmdsInDistDB), 0) FROM distribution.dbo.MSdistribution_status;")
+        return cursor.fetchval()
+
+def wait_for_sync(full_conn_str, max_wait=60, threshold=0, timeout=30):
+    """Polls the distributor with backoff until the undelivered command backlog drops to the threshold."""
+    deadline = time.monotonic() + max_wait
+    attempt = 0
+    while True:
+        try:
+            pending = get_undelivered_commands(full_conn_str, timeout)
+        except pyodbc.Error as ex:
+            # e.g. no local distributor or no access to the distribution database
+            logging.warning(f"Could not read replication status, waiting 10 seconds instead. Error: {ex}")
+            time.sleep(min(10, max_wait))
+            return False
+        if pending <= threshold:
+            logging.info(f"Replication caught up ({pending} commands pending)")
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning(f"{pending} commands still undelivered after {max_wait} seconds; counts may not match yet.")
+            return False
+        logging.info(f"Waiting for {pending} replicated commands to be delivered...")
+        time.sleep(min(2 ** attempt, 5, remaining))
+        attempt += 1
 
 # --- Main Verification Logic ---
-def verify_replication(config):
-    """Compares row counts between the master and replica databases."""
+def verify_replication(config, exact=False, checksum=False):
+    """Compares row counts between the master and replica databases (exact=True runs COUNT(*) for audits, checksum=True skips tables whose contents match)."""
     master_config = config['master_database']
     replicas_config = config['replica_databases']
     schemas_config = config['schemas_to_replicate']
 
-    # --- Build Connection Strings ---
-    master_conn_str = (
-        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-        f"SERVER={master_config['host']},{master_config['port']};"
-        f"UID={master_config['username']};"
-        f"PWD={master_config['password']};"
-        f"TrustServerCertificate=yes;"
-    )
+    replication_config = config.get('replication', {})
+    timeout = replication_config.get('connection_timeout', 30)
 
     logging.info("--- Starting Replication Verification ---")
-    # Give the replication a moment to catch up
-    logging.info("Waiting for 10 seconds to allow for data synchronization...")
-    time.sleep(10)
-
-    for schema_info in schemas_config:
-        schema = schema_info['schema_name']
-        for table_info in schema_info['tables']:
-            table = table_info['table_name']
-            
-            logging.info(f"\nVerifying Table: [{schema}].[{table}]")
-            
-            # --- Get Master Row Count ---
-            master_count = get_row_count(master_conn_str, master_config['database'], schema, table)
-            if master_count == -1:
-                logging.error(f"Could not retrieve row count from master for {schema}.{table}. Skipping.")
-                continue
-            
-            logging.info(f"  Master ({master_config['host']}:{master_config['port']}) -> Rows: {master_count}")
-
-            # --- Get Replica Row Counts ---
-            for replica in replicas_config:
-                replica_conn_str = (
-                    f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                    f"SERVER={replica['host']},{replica['port']};"
-                    f"UID={replica['username']};"
-                    f"PWD={replica['password']};"
-                    f"TrustServerCertificate=yes;"
-                )
-                
-                replica_count = get_row_count(replica_conn_str, replica['database'], schema, table)
-                
-                status = "SYNCED ✅" if master_count == replica_count else "NOT SYNCED ❌"
-                logging.info(f"  Replica '{replica['name']}' ({replica['host']}:{replica['port']}) -> Rows: {replica_count} | Status: {status}")
+
+    # --- Build Connection Strings (once, before any counting) ---
+    readonly_intent = master_config.get('use_readonly_intent', False)
+    master_full = build_conn_str(master_config, readonly_intent)
+    replica_conn_strs = {replica['name']: build_conn_str(replica, readonly_intent) for replica in replicas_config}
+
+    # Give the replication a chance to catch up, but only as long as it actually needs.
+    # The distribution database lives on the primary, so this probe never asks for read-only routing
+    distributor_full = build_conn_str(master_config) if readonly_intent else master_full
+    wait_for_sync(
+        distributor_full,
+        max_wait=replication_config.get('verify_max_wait_seconds', 60),
+        threshold=replication_config.get('verify_max_pending_commands', 0),
+        timeout=timeout,
+    )
+    
+    # Every table is counted in one batch per database, and the master and all
+    # replicas are counted concurrently; connections are cached per database
+    targets = [(master_full, master_config['database'])] + [
+        (replica_conn_strs[replica['name']], replica['database'])
+        for replica in replicas_config
+    ]
+
+    tables = [
+        (schema_info['schema_name'], table_info['table_name'])
+        for schema_info in schemas_config
+        for table_info in schema_info['tables']
+    ]
+
+    count_rows = get_all_row_counts if exact else get_all_row_counts_fast
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            if checksum:
+                # Tables whose content checksum matches on every replica need no counting
+                all_checksums = list(executor.map(
+                    lambda target: get_all_checksums(target[0], tables, timeout, target[1]), targets
+                ))
+                master_checksums, replica_checksums = all_checksums[0], all_checksums[1:]
+                matching = [
+                    key for key in tables
+                    if master_checksums[key] is not None
+                    and all(checksums[key] == master_checksums[key] for checksums in replica_checksums)
+                ]
+                for schema, table in matching:
+                    logging.info(f"\nVerifying Table: [{schema}].[{table}]")
+                    logging.info("  All replicas match the master checksum | Status: SYNCED ✅")
+                matched = set(matching)
+                tables = [key for key in tables if key not in matched]
+
+            all_counts = list(executor.map(
+                lambda target: count_rows(target[0], tables, timeout, target[1]), targets
+            )) if tables else [{}] * len(targets)
+    finally:
+        close_all()
+    master_counts, replica_counts = all_counts[0], all_counts[1:]
+
+    for schema, table in tables:
+        logging.info(f"\nVerifying Table: [{schema}].[{table}]")
+        
+        # --- Master Row Count ---
+        master_count = master_counts[(schema, table)]
+        if master_count == -1:
+            logging.error(f"Could not retrieve row count from master for {schema}.{table}. Skipping.")
+            continue
+        
+        logging.info(f"  Master ({master_config['host']}:{master_config['port']}) -> Rows: {master_count}")
+
+        # --- Replica Row Counts (logged in config order) ---
+        for replica, counts in zip(replicas_config, replica_counts):
+            replica_count = counts[(schema, table)]
+            status = "SYNCED ✅" if master_count == replica_count else "NOT SYNCED ❌"
+            logging.info(f"  Replica '{replica['name']}' ({replica['host']}:{replica['port']}) -> Rows: {replica_count} | Status: {status}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare master and replica row counts")
+    parser.add_argument('--exact', action='store_true',
+                        help="Run COUNT(*) on every table instead of reading partition metadata")
+    parser.add_argument('--checksum', action='store_true',
+                        help="Compare table checksums first and only count tables that differ")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     try:
         config = load_config()
-        verify_replication(config)
+        verify_replication(config, exact=args.exact, checksum=args.checksum)
         logging.info("\n--- Verification Complete ---")
     except FileNotFoundError:
         logging.error("Error: replication_config_enhanced.json not found.")